@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from fuzzy import FuzzyController
+
+# Benchmarks dos caminhos quentes do controle e da simulacao. Cada benchmark e uma funcao que prepara o
+# estado e retorna a chamada medida; as latencias sao medidas chamada a chamada
+
+BENCHMARKS = {}
+
+def benchmark(name, repeats=2000):
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeats)
+        return setup
+    return register
+
+def input_grid():
+    curvas, distancias = np.meshgrid(np.linspace(-180, 180, 37), np.linspace(0, 400, 21), indexing='ij')
+    return list(zip(curvas.ravel().tolist(), distancias.ravel().tolist()))
+
+def cycle(values):
+    # Alterna as entradas entre chamadas para nao medir sempre o mesmo ponto
+    state = {'i': 0}
+    def next_value():
+        value = values[state['i'] % len(values)]
+        state['i'] += 1
+        return value
+    return next_value
+
+@benchmark('computar[numpy]')
+def bench_computar_numpy():
+    controller = FuzzyController()
+    next_input = cycle(input_grid())
+    return lambda: controller.computar(*next_input())
+
+@benchmark('computar[sugeno]')
+def bench_computar_sugeno():
+    controller = FuzzyController(inferencia='sugeno')
+    next_input = cycle(input_grid())
+    return lambda: controller.computar(*next_input())
+
+@benchmark('computar[compilado]', repeats=20000)
+def bench_computar_compilado():
+    controller = FuzzyController()
+    controller.compilar(validar=False)
+    next_input = cycle(input_grid())
+    return lambda: controller.computar(*next_input())
+
+@benchmark('computar[skfuzzy]', repeats=100)
+def bench_computar_skfuzzy():
+    controller = FuzzyController(motor='skfuzzy')
+    next_input = cycle([(c, d) for c, d in input_grid() if c != 0])
+    return lambda: controller.computar(*next_input())
+
+@benchmark('computar_batch[1000]', repeats=200)
+def bench_computar_batch():
+    controller = FuzzyController()
+    rng = np.random.default_rng(0)
+    curvas, distancias = rng.uniform(-180, 180, 1000), rng.uniform(0, 400, 1000)
+    return lambda: controller.computar_batch(curvas, distancias)
+
+@benchmark('computar_batch[1000, sugeno]', repeats=200)
+def bench_computar_batch_sugeno():
+    controller = FuzzyController(inferencia='sugeno')
+    rng = np.random.default_rng(0)
+    curvas, distancias = rng.uniform(-180, 180, 1000), rng.uniform(0, 400, 1000)
+    return lambda: controller.computar_batch(curvas, distancias)
+
+def make_player(render=False):
+    from game import Player
+
+    return Player(500, 300, 1000, 600, render=render)
+
+@benchmark('Player.cast_ray', repeats=20000)
+def bench_cast_ray():
+    player = make_player()
+    next_angle = cycle(list(range(0, 360, 7)))
+    def run():
+        player.angle = next_angle()
+        return player.cast_ray()
+    return run
+
+@benchmark('Player.update')
+def bench_update():
+    player = make_player()
+    player.speed = 0
+    return player.update
+
+@benchmark('Player.update[drift]')
+def bench_update_drift():
+    # Carro parado girando em drift: cria uma marca de pneu por chamada, como em um drift longo
+    player = make_player(render=True)
+    player.speed = 0
+    player.drift_factor = player.target_drift_factor = 40
+    def run():
+        player.angle = (player.angle + 3) % 360
+        player.update()
+    return run
+
+@benchmark('GameLoop.tick[headless]', repeats=5000)
+def bench_tick():
+    from game import GameLoop
+
+    game = GameLoop(headless=True, seed=0)
+    return game.tick
+
+@benchmark('main_loop[headless, compilado]', repeats=5000)
+def bench_main_loop():
+    from game import GameLoop
+    from tuning import drive
+
+    game = GameLoop(headless=True, seed=0)
+    controller = FuzzyController()
+    controller.compilar(validar=False)
+    return lambda: drive(game, controller)
+
+def measure(run, repeats, warmup=20):
+    for _ in range(warmup):
+        run()
+
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter_ns()
+        run()
+        timings[i] = time.perf_counter_ns() - start
+
+    # Alocacoes medidas em uma passada separada, ja que o tracemalloc deixa as chamadas mais lentas
+    allocations = []
+    tracemalloc.start()
+    for _ in range(min(repeats, 200)):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run()
+        allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        'median_us': float(np.median(timings)) / 1000,
+        'p99_us': float(np.percentile(timings, 99)) / 1000,
+        'alloc_peak_bytes': int(np.median(allocations)),
+        'repeats': repeats
+    }
+
+def run_all(names=None, scale=1.0):
+    results = {}
+    for name, (setup, repeats) in BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+
+        results[name] = measure(setup(), max(10, int(repeats * scale)))
+        r = results[name]
+        print(f"{name:<32} mediana {r['median_us']:10.2f} us   p99 {r['p99_us']:10.2f} us   alocacao {r['alloc_peak_bytes']:>9} B")
+
+    return results
+
+def compare(results, baseline, threshold):
+    # Regressao: mediana acima da mediana de referencia por mais que a margem (fracao) informada
+    regressions = []
+    for name, result in results.items():
+        reference = baseline['benchmarks'].get(name)
+        if reference is None:
+            continue
+
+        ratio = result['median_us'] / reference['median_us']
+        status = 'REGRESSAO' if ratio > 1 + threshold else 'ok'
+        print(f"{name:<32} {reference['median_us']:10.2f} -> {result['median_us']:10.2f} us ({ratio:5.2f}x) {status}")
+        if status != 'ok':
+            regressions.append(name)
+
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks do controlador fuzzy e da simulacao')
+    parser.add_argument('names', nargs='*', help='roda apenas os benchmarks cujo nome contem algum destes trechos')
+    parser.add_argument('--save', metavar='ARQUIVO', help='salva os resultados como referencia em JSON')
+    parser.add_argument('--compare', metavar='ARQUIVO', help='compara com uma referencia salva e falha se houver regressao')
+    parser.add_argument('--threshold', type=float, default=0.2, help='margem de regressao sobre a mediana (padrao 0.2)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplica o numero de repeticoes')
+    args = parser.parse_args()
+
+    results = run_all(args.names, args.scale)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as file:
+            json.dump({
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'benchmarks': results
+            }, file, indent=2)
+        print(f'[INFO] Referencia salva em {args.save}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+        if regressions:
+            print(f"[ERRO] Regressoes: {', '.join(regressions)}")
+            raise SystemExit(1)
@@ -0,0 +1,152 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+import pygame
+
+# Gravacao dos frames da tela. O laco do jogo so copia os pixels da superficie para um buffer livre de um anel
+# preallocado (uma copia de memoria, sem conversao); a conversao para RGB e a escrita em disco ficam com uma
+# thread separada. Se todos os buffers estiverem ocupados o frame e descartado e contado, sem travar o jogo
+
+class FrameCapture:
+    def __init__(self, path, size, ring_size=8, every=1, fps=60, block=False):
+        # path terminado em .rgb ou .raw grava um video bruto (RGB24, frames seguidos) com um .json descrevendo
+        # o formato; qualquer outro caminho e uma pasta para a sequencia de PNGs.
+        # Com block, grab espera um buffer livre em vez de descartar o frame (para o modo headless, sem tempo real)
+        self.path = path
+        self.width, self.height = size
+        self.every = every
+        self.fps = fps
+        self.block = block
+        self.raw = path.endswith(('.rgb', '.raw'))
+
+        self.frames_seen = 0
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+
+        self.ring_size = ring_size
+        self.buffers = None
+        self.layout = None
+        self.free = queue.Queue()
+        self.pending = queue.Queue()
+        for i in range(ring_size):
+            self.free.put(i)
+
+        if self.raw:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.file = open(path, 'wb')
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.file = None
+
+        self.writer = threading.Thread(target=self._write_frames, daemon=True)
+        self.writer.start()
+
+    def _prepare(self, surface):
+        # Os buffers tem o layout da propria superficie (linhas com pitch bytes), entao a captura e um memcpy
+        width, height = surface.get_size()
+        bytesize = surface.get_bytesize()
+        if bytesize not in (3, 4):
+            raise ValueError(f'Formato de superficie nao suportado para captura: {bytesize} bytes por pixel')
+
+        # Posicao de cada canal dentro do pixel, a partir dos deslocamentos das mascaras (little-endian)
+        shifts = surface.get_shifts()
+        channels = [shift // 8 for shift in shifts[:3]]
+        if pygame.get_sdl_byteorder() != pygame.LIL_ENDIAN:
+            channels = [bytesize - 1 - channel for channel in channels]
+
+        self.layout = (width, height, surface.get_pitch(), bytesize, channels)
+        self.buffers = np.empty((self.ring_size, height * surface.get_pitch()), dtype=np.uint8)
+
+    def due(self):
+        # Verdadeiro se o proximo grab guarda o frame (um a cada every); permite nem desenhar os frames pulados
+        return self.frames_seen % self.every == 0
+
+    def skip(self):
+        self.frames_seen += 1
+
+    def grab(self, surface):
+        due = self.due()
+        self.frames_seen += 1
+        if not due:
+            return False
+
+        if self.buffers is None or self.layout[:3] != (*surface.get_size(), surface.get_pitch()):
+            if self.buffers is not None and self.raw:
+                # O video bruto tem um unico tamanho de frame: frames de outro tamanho sao descartados
+                self.dropped += 1
+                return False
+            if self.buffers is not None:
+                # Janela redimensionada: espera os frames do tamanho anterior antes de trocar os buffers
+                self.pending.join()
+            self._prepare(surface)
+
+        try:
+            slot = self.free.get(self.block)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+
+        # View dos pixels da superficie, sem copia; a unica copia e para o buffer do anel
+        pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint8)
+        np.copyto(self.buffers[slot], pixels[:self.buffers.shape[1]])
+        del pixels
+
+        self.pending.put((slot, self.captured, self.layout))
+        self.captured += 1
+        return True
+
+    def _write_frames(self):
+        rgb = None
+        while True:
+            item = self.pending.get()
+            if item is None:
+                self.pending.task_done()
+                return
+
+            slot, index, (width, height, pitch, bytesize, channels) = item
+            if rgb is None or rgb.shape[:2] != (height, width):
+                rgb = np.empty((height, width, 3), dtype=np.uint8)
+
+            # Um canal por vez para o buffer RGB reaproveitado (bem mais rapido que indexar pixels[:, :, channels])
+            try:
+                pixels = self.buffers[slot].reshape(height, pitch)[:, :width * bytesize].reshape(height, width, bytesize)
+                for i, channel in enumerate(channels):
+                    rgb[:, :, i] = pixels[:, :, channel]
+            finally:
+                self.free.put(slot)
+
+            if self.raw:
+                self.file.write(rgb.data)
+            else:
+                image = pygame.image.frombuffer(rgb.data, (width, height), 'RGB')
+                pygame.image.save(image, os.path.join(self.path, f'frame_{index:06d}.png'))
+
+            self.written += 1
+            self.pending.task_done()
+
+    def stats(self):
+        return {'captured': self.captured, 'dropped': self.dropped, 'written': self.written}
+
+    def close(self):
+        if self.writer is None:
+            return
+
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+
+        if self.file:
+            self.file.close()
+            self.file = None
+
+            # Descricao do video bruto, ex.: ffmpeg -f rawvideo -pixel_format rgb24 -video_size WxH -framerate FPS -i arquivo
+            width, height = self.layout[:2] if self.layout else (self.width, self.height)
+            with open(os.path.splitext(self.path)[0] + '.json', 'w') as file:
+                json.dump({'width': width, 'height': height, 'pixel_format': 'rgb24', 'fps': self.fps / self.every,
+                           'frames': self.written}, file, indent=2)
+
+        print(f'[INFO] Captura: {self.written} frames gravados em {self.path}, {self.dropped} descartados')
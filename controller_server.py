@@ -0,0 +1,287 @@
+import argparse
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fuzzy import FuzzyController
+from scheduling import process_context
+
+# Servidor local do controlador fuzzy para varias simulacoes em processos separados, que compartilham um unico
+# FuzzyController. Os pedidos (curva, distancia_borda) que chegam pelo socket Unix dentro de uma janela curta sao
+# avaliados juntos em um computar_batch, e cada cliente recebe o seu virar/velocidade
+
+# Pedido: curva, distancia_borda e se deve gerar relatorio; resposta: virar e velocidade
+REQUEST = struct.Struct('<ddB')
+RESPONSE = struct.Struct('<qd')
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'drifter-controle.sock')
+
+class ControllerServer:
+    def __init__(self, controller, path=DEFAULT_SOCKET, window=0.001, max_batch=1024, history=4096):
+        # window: tempo maximo (s) que o primeiro pedido de um lote espera por outros. O lote fecha antes se
+        # todos os clientes conectados ja tiverem um pedido pendente (cada cliente espera a sua resposta)
+        self.controller = controller
+        self.path = path
+        self.window = window
+        self.max_batch = max_batch
+
+        self.selector = selectors.DefaultSelector()
+        self.buffers = {}
+        self.pending = []
+        self.running = False
+        self.thread = None
+        self.listener = None
+
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.compute_time = 0.0
+        self.start_time = None
+        # Espera de cada pedido na fila (da chegada ate o inicio do lote), nos ultimos history pedidos
+        self.waits = np.zeros(history)
+        self.wait_sum = 0.0
+        self.max_wait = 0.0
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()
+        self.buffers.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def serve(self):
+        while self.running:
+            if self.pending:
+                timeout = max(0.0, self.pending[0][4] + self.window - time.perf_counter())
+            else:
+                # Sem pedidos pendentes, acorda de tempos em tempos so para verificar o stop
+                timeout = 0.1
+
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self.listener:
+                    self._accept()
+                else:
+                    self._receive(key.fileobj)
+
+            if self.pending and (
+                len(self.pending) >= min(len(self.buffers), self.max_batch)
+                or time.perf_counter() - self.pending[0][4] >= self.window
+            ):
+                self._run_batch()
+
+    def _accept(self):
+        try:
+            connection, _ = self.listener.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(True)
+        self.buffers[connection] = bytearray()
+        self.selector.register(connection, selectors.EVENT_READ)
+
+    def _drop(self, connection):
+        # Cliente desconectado (ou com erro): descarta os pedidos que ele deixou sem resposta
+        if connection not in self.buffers:
+            return
+        self.selector.unregister(connection)
+        del self.buffers[connection]
+        self.pending = [request for request in self.pending if request[0] is not connection]
+        connection.close()
+
+    def _receive(self, connection):
+        try:
+            data = connection.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(connection)
+            return
+
+        arrival = time.perf_counter()
+        buffer = self.buffers[connection]
+        buffer += data
+        while len(buffer) >= REQUEST.size:
+            curva, distancia, relatorio = REQUEST.unpack_from(buffer)
+            del buffer[:REQUEST.size]
+            self.pending.append((connection, curva, distancia, relatorio, arrival))
+
+    def _evaluate(self, batch):
+        curvas = np.array([request[1] for request in batch])
+        distancias = np.array([request[2] for request in batch])
+        outputs = self.controller.computar_batch(curvas, distancias)
+        virar, velocidade = outputs['virar'], outputs['velocidade']
+
+        responses = []
+        for i, (connection, curva, distancia, relatorio, arrival) in enumerate(batch):
+            if relatorio:
+                # O relatorio usa o caminho completo do computar, fora do lote
+                output = self.controller.computar(curva, distancia, gerar_relatorio=True)
+                responses.append(RESPONSE.pack(output['virar'], output['velocidade']))
+            else:
+                responses.append(RESPONSE.pack(int(virar[i]), float(velocidade[i])))
+        return responses
+
+    def _run_batch(self):
+        batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+
+        start = time.perf_counter()
+        try:
+            responses = self._evaluate(batch)
+        except Exception as erro:
+            # Um lote com erro nao derruba o servidor: os clientes do lote sao desconectados, e o computar deles
+            # falha com ConnectionError em vez de esperar uma resposta para sempre
+            print(f'[ERRO] Lote de {len(batch)} pedidos falhou: {erro!r}')
+            for connection in {request[0] for request in batch}:
+                self._drop(connection)
+            return
+
+        for (connection, curva, distancia, relatorio, arrival), response in zip(batch, responses):
+            try:
+                connection.sendall(response)
+            except OSError:
+                self._drop(connection)
+
+            wait = start - arrival
+            self.waits[self.requests % len(self.waits)] = wait
+            self.wait_sum += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.requests += 1
+
+        self.batches += 1
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.compute_time += time.perf_counter() - start
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0
+        waits = self.waits[:min(self.requests, len(self.waits))]
+        return {
+            'clients': len(self.buffers),
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0,
+            'max_batch_size': self.max_batch_size,
+            'requests_per_second': self.requests / elapsed if elapsed else 0,
+            'mean_wait': self.wait_sum / self.requests if self.requests else 0,
+            'p99_wait': float(np.percentile(waits, 99)) if len(waits) else 0,
+            'max_wait': self.max_wait,
+            'mean_batch_time': self.compute_time / self.batches if self.batches else 0
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return [
+            f"Servidor: {stats['clients']} clientes, {stats['requests_per_second']:.0f} pedidos/s, "
+            f"lote medio {stats['mean_batch_size']:.1f} (max {stats['max_batch_size']})",
+            f"Espera na fila: media {stats['mean_wait'] * 1000:.3f} ms, p99 {stats['p99_wait'] * 1000:.3f} ms, "
+            f"max {stats['max_wait'] * 1000:.3f} ms; lote {stats['mean_batch_time'] * 1000:.3f} ms"
+        ]
+
+class ControllerClient:
+    # Substitui o FuzzyController nas simulacoes: computar envia o pedido ao servidor e espera a resposta.
+    # A conexao so e aberta no primeiro computar, entao o cliente pode ser criado antes de um fork
+    def __init__(self, path=DEFAULT_SOCKET):
+        self.path = path
+        self.connection = None
+        self.response = bytearray(RESPONSE.size)
+
+    def computar(self, curva_input, distancia_borda_input, gerar_relatorio=False):
+        if self.connection is None:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(self.path)
+
+        self.connection.sendall(REQUEST.pack(curva_input, distancia_borda_input, gerar_relatorio))
+
+        view = memoryview(self.response)
+        received = 0
+        while received < RESPONSE.size:
+            count = self.connection.recv_into(view[received:])
+            if not count:
+                raise ConnectionError('Servidor do controlador fechou a conexao')
+            received += count
+
+        virar, velocidade = RESPONSE.unpack(self.response)
+        return {
+            'virar': virar,
+            'velocidade': velocidade
+        }
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def _simulate(path, seed, ticks):
+    from tuning import run_episode
+
+    client = ControllerClient(path)
+    try:
+        return run_episode(client, seed, ticks)
+    finally:
+        client.close()
+
+def run_simulations(simulations=24, ticks=3600, path=DEFAULT_SOCKET, window=0.001, inferencia='mamdani'):
+    # Varias simulacoes headless, cada uma no seu processo, usando o mesmo controlador pelo servidor
+    server = ControllerServer(FuzzyController(pasta_cache='output/cache', inferencia=inferencia), path, window).start()
+
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=simulations, mp_context=process_context()) as pool:
+            results = list(pool.map(_simulate, [path] * simulations, range(simulations), [ticks] * simulations))
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = server.stats()
+        server.stop()
+
+    return results, stats, elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor local do controlador fuzzy, com pedidos avaliados em lote')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--janela', type=float, default=0.001, help='espera maxima (s) para juntar pedidos em um lote')
+    parser.add_argument('--inferencia', choices=['mamdani', 'sugeno'], default='mamdani')
+    parser.add_argument('--simulacoes', type=int, default=0, help='roda N simulacoes headless contra o servidor e sai')
+    parser.add_argument('--ticks', type=int, default=3600)
+    args = parser.parse_args()
+
+    if args.simulacoes:
+        results, stats, elapsed = run_simulations(args.simulacoes, args.ticks, args.socket, args.janela, args.inferencia)
+        for seed, result in enumerate(results):
+            print(f'[INFO] Simulacao {seed}: {result}')
+        print(f'[INFO] {args.simulacoes} simulacoes de {args.ticks} ticks em {elapsed:.1f}s: {stats}')
+    else:
+        server = ControllerServer(FuzzyController(pasta_cache='output/cache', inferencia=args.inferencia), args.socket, args.janela).start()
+        print(f'[INFO] Servidor do controlador em {args.socket}')
+        try:
+            while True:
+                time.sleep(5)
+                print('[INFO] ' + ' | '.join(server.summary()))
+        except KeyboardInterrupt:
+            server.stop()
@@ -1,113 +1,482 @@
+import hashlib
 import os
+import sys
+import time
+import zipfile
+
+_inicio_importacao = time.perf_counter()
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
-import matplotlib.pyplot as plt
+TEMPO_IMPORTACAO = time.perf_counter() - _inicio_importacao
+
+# skfuzzy.control importa matplotlib.pyplot, entao skfuzzy e matplotlib so sao carregados quando
+# o caminho exato do skfuzzy, a comparacao ou o relatorio sao usados
+
+# Maior diferenca aceita entre o MotorMamdani e o skfuzzy.control para as mesmas entradas
+TOLERANCIA_MOTOR = 1e-9
+
+ANTECEDENTES = ('curva', 'distancia_borda')
+CONSEQUENTES = ('virar', 'velocidade')
+
+# Incrementar quando o conteudo do cache mudar de formato, para invalidar os arquivos antigos
+VERSAO_CACHE = 1
+
+def trimf(x, abc):
+    # Mesma construcao de skfuzzy.trimf, para gerar as pertinencias sem importar o skfuzzy
+    a, b, c = abc
+    y = np.zeros(len(x))
+
+    if a != b:
+        idx = np.nonzero(np.logical_and(a < x, x < b))[0]
+        y[idx] = (x[idx] - a) / float(b - a)
+
+    if b != c:
+        idx = np.nonzero(np.logical_and(b < x, x < c))[0]
+        y[idx] = (c - x[idx]) / float(c - b)
+
+    y[np.nonzero(x == b)] = 1
+    return y
+
+def trapmf(x, abcd):
+    # Mesma construcao de skfuzzy.trapmf
+    a, b, c, d = abcd
+    y = np.ones(len(x))
+
+    idx = np.nonzero(x <= b)[0]
+    y[idx] = trimf(x[idx], [a, b, b])
+
+    idx = np.nonzero(x >= c)[0]
+    y[idx] = trimf(x[idx], [c, c, d])
+
+    y[np.nonzero(x < a)[0]] = 0
+    y[np.nonzero(x > d)[0]] = 0
+    return y
+
+def gerar_pertinencia(universo, pontos):
+    return trimf(universo, pontos) if len(pontos) == 3 else trapmf(universo, pontos)
 
 class FuzzyController:
-    def __init__(self):
-        self.curva = ctrl.Antecedent(np.arange(-180, 181, 1), 'curva')
-        self.distancia_borda = ctrl.Antecedent(np.arange(0, 1920, 1), 'distancia_borda')
+    def __init__(self, compilado=False, passo_curva=1, passo_distancia=1, motor='numpy', funcoes_pertinencia=None, pasta_cache=None,
+                 inferencia='mamdani'):
+        # Com pasta_cache, as pertinencias amostradas, as matrizes de regras e as superficies compiladas sao guardadas
+        # em um .npz identificado pelo hash dos pontos e das regras, e reaproveitadas (mapeadas em memoria) depois.
+        # inferencia='sugeno' troca cada termo de saida por um valor unico (singleton) e a saida passa a ser a
+        # media das regras ponderada pela ativacao, sem agregacao sobre o universo de saida (so com motor='numpy')
+        if inferencia not in ('mamdani', 'sugeno'):
+            raise ValueError(f'Inferencia desconhecida: {inferencia}')
+        if inferencia == 'sugeno' and motor != 'numpy':
+            raise ValueError("A inferencia 'sugeno' so esta disponivel com motor='numpy'")
 
-        self.virar = ctrl.Consequent(np.arange(-1, 1.1, 0.5), 'virar')
-        self.velocidade = ctrl.Consequent(np.arange(-2.5, 0.3, 0.01), 'velocidade')
+        self.tempos_inicializacao = {}
+        self.motor = motor
+        self.inferencia = inferencia
 
+        inicio = time.perf_counter()
+        self.universos = {
+            'curva': np.arange(-180, 181, 1),
+            'distancia_borda': np.arange(0, 1920, 1),
+            'virar': np.arange(-1, 1.1, 0.5),
+            'velocidade': np.arange(-2.5, 0.3, 0.01)
+        }
         self._definir_funcoes_pertinencia()
+        if funcoes_pertinencia is not None:
+            # Substitui os pontos das variaveis informadas, mantendo as demais
+            self.funcoes_pertinencia = {**self.funcoes_pertinencia, **funcoes_pertinencia}
         self._definir_regras()
-        self._criar_control_system()
+
+        self.pasta_cache = pasta_cache
+        self.artefatos = self._carregar_cache() if pasta_cache else {}
+        carregado_do_cache = bool(self.artefatos)
+
+        if carregado_do_cache:
+            self.pertinencias = {variavel: self.artefatos[f'pertinencia_{variavel}'] for variavel in self.funcoes_pertinencia}
+        else:
+            self.pertinencias = {
+                variavel: np.array([gerar_pertinencia(self.universos[variavel], pontos) for pontos in termos.values()])
+                for variavel, termos in self.funcoes_pertinencia.items()
+            }
+        self.tempos_inicializacao['funcoes_pertinencia'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        self._criar_motores()
+        self.tempos_inicializacao['motores'] = time.perf_counter() - inicio
+
+        if pasta_cache and not carregado_do_cache:
+            self.artefatos.update({f'pertinencia_{variavel}': mfs for variavel, mfs in self.pertinencias.items()})
+            for saida in CONSEQUENTES:
+                self.artefatos[f'regras_{saida}'] = self.motores[saida].regras
+                self.artefatos[f'consequentes_{saida}'] = self.motores[saida].consequentes
+            self._salvar_cache()
+
+        # Objetos do skfuzzy, montados sob demanda por _criar_control_system
+        self.virar_sim = None
+        self.velocidade_sim = None
+
+        self.relatorios = None
+
+        self.superficie = None
+        self.erro_compilacao = None
+        if compilado:
+            inicio = time.perf_counter()
+            self.compilar(passo_curva, passo_distancia)
+            self.tempos_inicializacao['compilacao'] = time.perf_counter() - inicio
 
     def _definir_funcoes_pertinencia(self):
-        self.distancia_borda['perto'] = fuzz.trapmf(self.distancia_borda.universe, [0, 0, 75, 100])
-        self.distancia_borda['medio'] = fuzz.trimf(self.distancia_borda.universe, [75, 100, 150])
-        self.distancia_borda['longe'] = fuzz.trapmf(self.distancia_borda.universe, [100, 150, np.inf, np.inf])
-
-        self.curva['fechada_esq'] = fuzz.trapmf(self.curva.universe, [-180, -180, -120, -45])
-        self.curva['media_esq'] = fuzz.trimf(self.curva.universe, [-120, -45, -15])
-        self.curva['aberta_esq'] = fuzz.trimf(self.curva.universe, [-45, -15, 0])
-        self.curva['aberta_dir'] = fuzz.trimf(self.curva.universe, [0, 15, 45])
-        self.curva['media_dir'] = fuzz.trimf(self.curva.universe, [15, 45, 120])
-        self.curva['fechada_dir'] = fuzz.trapmf(self.curva.universe, [45, 120, 180, 180])
-
-        self.velocidade['frear_muito'] = fuzz.trapmf(self.velocidade.universe, [-2.5, -2.5, -2, -1.5])
-        self.velocidade['frear_medio'] = fuzz.trimf(self.velocidade.universe, [-2, -1, 0])
-        self.velocidade['frear_pouco'] = fuzz.trimf(self.velocidade.universe, [-0.5, 0, 0.1])
-        self.velocidade['manter'] = fuzz.trimf(self.velocidade.universe, [0, 0.1, 0.2])
-        self.velocidade['acelerar'] = fuzz.trapmf(self.velocidade.universe, [0.1, 0.2, 0.3, 0.3])
-
-        self.virar['esquerda'] = fuzz.trimf(self.virar.universe, [-1, -1, 0])
-        self.virar['manter'] = fuzz.trimf(self.virar.universe, [-0.5, 0, 0.5])
-        self.virar['direita'] = fuzz.trimf(self.virar.universe, [0, 1, 1])
+        # Pontos de cada termo: 3 para triangular (trimf) e 4 para trapezoidal (trapmf)
+        self.funcoes_pertinencia = {
+            'distancia_borda': {
+                'perto': [0, 0, 75, 100],
+                'medio': [75, 100, 150],
+                'longe': [100, 150, np.inf, np.inf]
+            },
+            'curva': {
+                'fechada_esq': [-180, -180, -120, -45],
+                'media_esq': [-120, -45, -15],
+                'aberta_esq': [-45, -15, 0],
+                'aberta_dir': [0, 15, 45],
+                'media_dir': [15, 45, 120],
+                'fechada_dir': [45, 120, 180, 180]
+            },
+            'velocidade': {
+                'frear_muito': [-2.5, -2.5, -2, -1.5],
+                'frear_medio': [-2, -1, 0],
+                'frear_pouco': [-0.5, 0, 0.1],
+                'manter': [0, 0.1, 0.2],
+                'acelerar': [0.1, 0.2, 0.3, 0.3]
+            },
+            'virar': {
+                'esquerda': [-1, -1, 0],
+                'manter': [-0.5, 0, 0.5],
+                'direita': [0, 1, 1]
+            }
+        }
 
     def _definir_regras(self):
-        self.rules_virar = [
-            ctrl.Rule(self.curva['fechada_esq'] & self.distancia_borda['perto'], self.virar['esquerda']),
-            ctrl.Rule(self.curva['fechada_esq'] & self.distancia_borda['medio'], self.virar['esquerda']),
-            ctrl.Rule(self.curva['fechada_esq'] & self.distancia_borda['longe'], self.virar['esquerda']),
+        # Cada regra e (termo de curva, termo de distancia_borda, termo de saida), combinados com 'and'
+        self.regras = {
+            'virar': [
+                ('fechada_esq', 'perto', 'esquerda'),
+                ('fechada_esq', 'medio', 'esquerda'),
+                ('fechada_esq', 'longe', 'esquerda'),
 
-            ctrl.Rule(self.curva['media_esq'] & self.distancia_borda['perto'], self.virar['esquerda']),
-            ctrl.Rule(self.curva['media_esq'] & self.distancia_borda['medio'], self.virar['esquerda']),
-            ctrl.Rule(self.curva['media_esq'] & self.distancia_borda['longe'], self.virar['esquerda']),
+                ('media_esq', 'perto', 'esquerda'),
+                ('media_esq', 'medio', 'esquerda'),
+                ('media_esq', 'longe', 'esquerda'),
 
-            ctrl.Rule(self.curva['aberta_esq'] & self.distancia_borda['perto'], self.virar['esquerda']),
-            ctrl.Rule(self.curva['aberta_esq'] & self.distancia_borda['medio'], self.virar['esquerda']),
-            ctrl.Rule(self.curva['aberta_esq'] & self.distancia_borda['longe'], self.virar['manter']),
+                ('aberta_esq', 'perto', 'esquerda'),
+                ('aberta_esq', 'medio', 'esquerda'),
+                ('aberta_esq', 'longe', 'manter'),
 
-            ctrl.Rule(self.curva['fechada_dir'] & self.distancia_borda['perto'], self.virar['direita']),
-            ctrl.Rule(self.curva['fechada_dir'] & self.distancia_borda['medio'], self.virar['direita']),
-            ctrl.Rule(self.curva['fechada_dir'] & self.distancia_borda['longe'], self.virar['direita']),
+                ('fechada_dir', 'perto', 'direita'),
+                ('fechada_dir', 'medio', 'direita'),
+                ('fechada_dir', 'longe', 'direita'),
 
-            ctrl.Rule(self.curva['media_dir'] & self.distancia_borda['perto'], self.virar['direita']),
-            ctrl.Rule(self.curva['media_dir'] & self.distancia_borda['medio'], self.virar['direita']),
-            ctrl.Rule(self.curva['media_dir'] & self.distancia_borda['longe'], self.virar['direita']),
+                ('media_dir', 'perto', 'direita'),
+                ('media_dir', 'medio', 'direita'),
+                ('media_dir', 'longe', 'direita'),
 
-            ctrl.Rule(self.curva['aberta_dir'] & self.distancia_borda['perto'], self.virar['direita']),
-            ctrl.Rule(self.curva['aberta_dir'] & self.distancia_borda['medio'], self.virar['direita']),
-            ctrl.Rule(self.curva['aberta_dir'] & self.distancia_borda['longe'], self.virar['manter']),
-        ]
+                ('aberta_dir', 'perto', 'direita'),
+                ('aberta_dir', 'medio', 'direita'),
+                ('aberta_dir', 'longe', 'manter'),
+            ],
+            'velocidade': [
+                ('fechada_esq', 'perto', 'frear_muito'),
+                ('fechada_esq', 'medio', 'frear_medio'),
+                ('fechada_esq', 'longe', 'frear_medio'),
 
-        self.rules_velocidade = [
-            ctrl.Rule(self.curva['fechada_esq'] & self.distancia_borda['perto'], self.velocidade['frear_muito']),
-            ctrl.Rule(self.curva['fechada_esq'] & self.distancia_borda['medio'], self.velocidade['frear_medio']),
-            ctrl.Rule(self.curva['fechada_esq'] & self.distancia_borda['longe'], self.velocidade['frear_medio']),
+                ('fechada_dir', 'perto', 'frear_muito'),
+                ('fechada_dir', 'medio', 'frear_medio'),
+                ('fechada_dir', 'longe', 'frear_medio'),
 
-            ctrl.Rule(self.curva['fechada_dir'] & self.distancia_borda['perto'], self.velocidade['frear_muito']),
-            ctrl.Rule(self.curva['fechada_dir'] & self.distancia_borda['medio'], self.velocidade['frear_medio']),
-            ctrl.Rule(self.curva['fechada_dir'] & self.distancia_borda['longe'], self.velocidade['frear_medio']),
+                ('media_esq', 'perto', 'frear_medio'),
+                ('media_esq', 'medio', 'frear_pouco'),
+                ('media_esq', 'longe', 'manter'),
 
-            ctrl.Rule(self.curva['media_esq'] & self.distancia_borda['perto'], self.velocidade['frear_medio']),
-            ctrl.Rule(self.curva['media_esq'] & self.distancia_borda['medio'], self.velocidade['frear_pouco']),
-            ctrl.Rule(self.curva['media_esq'] & self.distancia_borda['longe'], self.velocidade['manter']),
+                ('media_dir', 'perto', 'frear_medio'),
+                ('media_dir', 'medio', 'frear_pouco'),
+                ('media_dir', 'longe', 'manter'),
+
+                ('aberta_esq', 'perto', 'frear_pouco'),
+                ('aberta_esq', 'medio', 'acelerar'),
+                ('aberta_esq', 'longe', 'acelerar'),
+
+                ('aberta_dir', 'perto', 'frear_pouco'),
+                ('aberta_dir', 'medio', 'acelerar'),
+                ('aberta_dir', 'longe', 'acelerar'),
+            ]
+        }
+
+    def _criar_control_system(self):
+        # Monta as variaveis, regras e simulacoes do skfuzzy a partir das mesmas tabelas usadas pelos motores
+        if self.virar_sim is not None:
+            return
 
-            ctrl.Rule(self.curva['media_dir'] & self.distancia_borda['perto'], self.velocidade['frear_medio']),
-            ctrl.Rule(self.curva['media_dir'] & self.distancia_borda['medio'], self.velocidade['frear_pouco']),
-            ctrl.Rule(self.curva['media_dir'] & self.distancia_borda['longe'], self.velocidade['manter']),
+        from skfuzzy import control as ctrl
 
-            ctrl.Rule(self.curva['aberta_esq'] & self.distancia_borda['perto'], self.velocidade['frear_pouco']),
-            ctrl.Rule(self.curva['aberta_esq'] & self.distancia_borda['medio'], self.velocidade['acelerar']),
-            ctrl.Rule(self.curva['aberta_esq'] & self.distancia_borda['longe'], self.velocidade['acelerar']),
+        self.curva = ctrl.Antecedent(self.universos['curva'], 'curva')
+        self.distancia_borda = ctrl.Antecedent(self.universos['distancia_borda'], 'distancia_borda')
 
-            ctrl.Rule(self.curva['aberta_dir'] & self.distancia_borda['perto'], self.velocidade['frear_pouco']),
-            ctrl.Rule(self.curva['aberta_dir'] & self.distancia_borda['medio'], self.velocidade['acelerar']),
-            ctrl.Rule(self.curva['aberta_dir'] & self.distancia_borda['longe'], self.velocidade['acelerar']),
+        self.virar = ctrl.Consequent(self.universos['virar'], 'virar')
+        self.velocidade = ctrl.Consequent(self.universos['velocidade'], 'velocidade')
+
+        for variavel in (self.curva, self.distancia_borda, self.virar, self.velocidade):
+            for termo, mf in zip(self.funcoes_pertinencia[variavel.label], self.pertinencias[variavel.label]):
+                variavel[termo] = mf
+
+        self.rules_virar = [
+            ctrl.Rule(self.curva[curva] & self.distancia_borda[distancia], self.virar[saida])
+            for curva, distancia, saida in self.regras['virar']
+        ]
+        self.rules_velocidade = [
+            ctrl.Rule(self.curva[curva] & self.distancia_borda[distancia], self.velocidade[saida])
+            for curva, distancia, saida in self.regras['velocidade']
         ]
 
-    def _criar_control_system(self):
         self.virar_ctrl = ctrl.ControlSystem(self.rules_virar)
         self.velocidade_ctrl = ctrl.ControlSystem(self.rules_velocidade)
 
         self.virar_sim = ctrl.ControlSystemSimulation(self.virar_ctrl)
         self.velocidade_sim = ctrl.ControlSystemSimulation(self.velocidade_ctrl)
 
+    def _criar_motores(self):
+        termos_entrada = [list(self.funcoes_pertinencia[variavel]) for variavel in ANTECEDENTES]
+
+        self.motores = {}
+        for saida in CONSEQUENTES:
+            if f'regras_{saida}' in self.artefatos:
+                regras = self.artefatos[f'regras_{saida}']
+                consequentes = self.artefatos[f'consequentes_{saida}']
+            else:
+                termos_saida = list(self.funcoes_pertinencia[saida])
+                regras = [[termos.index(termo) for termos, termo in zip(termos_entrada, regra[:-1])] for regra in self.regras[saida]]
+                consequentes = [termos_saida.index(regra[-1]) for regra in self.regras[saida]]
+
+            classe_motor = MotorSugeno if self.inferencia == 'sugeno' else MotorMamdani
+            self.motores[saida] = classe_motor(
+                [self.universos[variavel] for variavel in ANTECEDENTES],
+                [self.pertinencias[variavel] for variavel in ANTECEDENTES],
+                self.universos[saida],
+                self.pertinencias[saida],
+                regras,
+                consequentes
+            )
+
+    def _chave_cache(self):
+        # Hash de tudo que define o controlador: universos, pontos de cada termo e regras.
+        # Qualquer mudanca em _definir_funcoes_pertinencia ou _definir_regras gera outra chave (e outro arquivo)
+        conteudo = hashlib.sha256(f'versao {VERSAO_CACHE} {self.inferencia}'.encode())
+        for variavel in sorted(self.universos):
+            conteudo.update(variavel.encode())
+            conteudo.update(np.ascontiguousarray(self.universos[variavel], dtype=np.float64).tobytes())
+            termos = [(termo, [float(p) for p in pontos]) for termo, pontos in self.funcoes_pertinencia[variavel].items()]
+            conteudo.update(repr(termos).encode())
+        for saida in sorted(self.regras):
+            conteudo.update(repr((saida, self.regras[saida])).encode())
+
+        return conteudo.hexdigest()[:20]
+
+    def _arquivo_cache(self):
+        return os.path.join(self.pasta_cache, f'controle_{self._chave_cache()}.npz')
+
+    def _carregar_cache(self):
+        arquivo = self._arquivo_cache()
+        if not os.path.exists(arquivo):
+            return {}
+
+        try:
+            return carregar_npz_mapeado(arquivo)
+        except (OSError, ValueError, zipfile.BadZipFile) as erro:
+            print(f'[AVISO] Cache ignorado ({arquivo}): {erro}')
+            return {}
+
+    def _salvar_cache(self):
+        # Escreve em um arquivo temporario e troca, para que um processo lendo o cache nunca veja um arquivo pela metade
+        os.makedirs(self.pasta_cache, exist_ok=True)
+        arquivo = self._arquivo_cache()
+        temporario = f'{arquivo}.{os.getpid()}.tmp'
+        with open(temporario, 'wb') as file:
+            np.savez(file, **self.artefatos)
+        os.replace(temporario, arquivo)
+
+    def compilar(self, passo_curva=1, passo_distancia=1, validar=True):
+        # Amostra as saidas sobre a grade curva x distancia_borda uma unica vez, usando o motor vetorial.
+        # Fora do intervalo onde as pertinencias variam as saidas sao constantes, entao a grade so cobre esse trecho
+        prefixo = f'superficie_{passo_curva:g}_{passo_distancia:g}'
+        alterou_cache = False
+
+        if f'{prefixo}_virar' in self.artefatos:
+            self.superficie = SuperficieCompilada(*(self.artefatos[f'{prefixo}_{nome}'] for nome in ('eixo_curva', 'eixo_distancia', 'virar', 'velocidade')))
+        else:
+            eixo_curva = self._eixo_amostragem('curva', passo_curva)
+            eixo_distancia = self._eixo_amostragem('distancia_borda', passo_distancia)
+
+            curvas, distancias = np.meshgrid(eixo_curva, eixo_distancia, indexing='ij')
+            virar, velocidade = self._avaliar_com_limites(self._avaliar_motores, curvas.ravel(), distancias.ravel())
+
+            self.superficie = SuperficieCompilada(
+                eixo_curva,
+                eixo_distancia,
+                virar.reshape(curvas.shape),
+                velocidade.reshape(curvas.shape)
+            )
+
+            if self.pasta_cache:
+                for nome in ('eixo_curva', 'eixo_distancia', 'virar', 'velocidade'):
+                    self.artefatos[f'{prefixo}_{nome}'] = getattr(self.superficie, nome)
+                alterou_cache = True
+
+        if validar:
+            if f'{prefixo}_erro' in self.artefatos:
+                erro_virar, erro_velocidade = self.artefatos[f'{prefixo}_erro']
+                self.erro_compilacao = {'virar': float(erro_virar), 'velocidade': float(erro_velocidade)}
+            else:
+                self.erro_compilacao = self.medir_erro_compilacao()
+                if self.pasta_cache:
+                    self.artefatos[f'{prefixo}_erro'] = np.array([self.erro_compilacao['virar'], self.erro_compilacao['velocidade']])
+                    alterou_cache = True
+
+            print(f"[INFO] Controle compilado ({self.superficie.virar.size} pontos). Erro maximo: "
+                  f"virar {self.erro_compilacao['virar']:.4f}, velocidade {self.erro_compilacao['velocidade']:.4f}")
+
+        if alterou_cache:
+            self._salvar_cache()
+
+        return self.erro_compilacao
+
+    def medir_erro_compilacao(self):
+        # Compara a interpolacao com a inferencia completa no centro de cada celula da grade, onde o erro bilinear e maior.
+        # O motor vetorial coincide com o skfuzzy dentro de TOLERANCIA_MOTOR (ver comparar_motor)
+        s = self.superficie
+        centros_curva = (s.eixo_curva[:-1] + s.eixo_curva[1:]) / 2
+        centros_distancia = (s.eixo_distancia[:-1] + s.eixo_distancia[1:]) / 2
+        curvas, distancias = np.meshgrid(centros_curva, centros_distancia, indexing='ij')
+        curvas, distancias = curvas.ravel(), distancias.ravel()
+
+        virar_exato, velocidade_exato = self._avaliar_com_limites(self._avaliar_motores, curvas, distancias)
+        aproximado = np.array([s.avaliar(c, d) for c, d in zip(curvas, distancias)])
+
+        return {
+            'virar': float(np.max(np.abs(aproximado[:, 0] - virar_exato))),
+            'velocidade': float(np.max(np.abs(aproximado[:, 1] - velocidade_exato)))
+        }
+
+    def comparar_motor(self, amostras=2000, semente=0):
+        # Maior diferenca entre o motor vetorial e o skfuzzy em pontos aleatorios do universo de entrada
+        rng = np.random.default_rng(semente)
+        curvas = rng.uniform(self.universos['curva'][0], self.universos['curva'][-1], amostras)
+        distancias = rng.uniform(0, 250, amostras)
+
+        virar_skfuzzy, velocidade_skfuzzy = self._avaliar_com_limites(self._amostrar_skfuzzy, curvas, distancias)
+        virar_motor, velocidade_motor = self._avaliar_com_limites(self._avaliar_motores, curvas, distancias)
+
+        return {
+            'virar': float(np.max(np.abs(virar_motor - virar_skfuzzy))),
+            'velocidade': float(np.max(np.abs(velocidade_motor - velocidade_skfuzzy)))
+        }
+
+    def faixa_ativa(self, variavel):
+        # Trecho do universo em que alguma pertinencia muda; fora dele as pertinencias sao constantes
+        universo = self.universos[variavel]
+        variacoes = np.flatnonzero(np.any(np.diff(self.pertinencias[variavel], axis=1) != 0, axis=0))
+
+        inicio = universo[variacoes[0]] if len(variacoes) else universo[0]
+        fim = universo[variacoes[-1] + 1] if len(variacoes) else universo[-1]
+        return inicio, fim
+
+    def _eixo_amostragem(self, variavel, passo):
+        inicio, fim = self.faixa_ativa(variavel)
+        pontos = max(2, int(np.ceil((fim - inicio) / passo)) + 1)
+        return np.linspace(inicio, fim, pontos)
+
+    def _sem_ativacao(self, variavel, valores):
+        pertinencias = [np.interp(valores, self.universos[variavel], mf) for mf in self.pertinencias[variavel]]
+        return np.sum(pertinencias, axis=0) == 0
+
+    def _avaliar_com_limites(self, avaliar, curvas, distancias):
+        # Entradas que nao ativam nenhum termo (ex.: curva = 0) nao disparam regras e nao tem centroide,
+        # entao nesses pontos usa-se a media dos limites laterais
+        delta = 1e-6
+        vazio_curva = self._sem_ativacao('curva', curvas)
+        vazio_distancia = self._sem_ativacao('distancia_borda', distancias)
+        vazio = vazio_curva | vazio_distancia
+
+        if not vazio.any():
+            return avaliar(curvas, distancias)
+
+        entradas_curva = np.concatenate([
+            curvas[~vazio],
+            curvas[vazio] - delta * vazio_curva[vazio],
+            curvas[vazio] + delta * vazio_curva[vazio]
+        ])
+        entradas_distancia = np.concatenate([
+            distancias[~vazio],
+            distancias[vazio] - delta * vazio_distancia[vazio],
+            distancias[vazio] + delta * vazio_distancia[vazio]
+        ])
+
+        n_cheios, n_vazios = np.count_nonzero(~vazio), np.count_nonzero(vazio)
+        saidas = []
+        for resultado in avaliar(entradas_curva, entradas_distancia):
+            valores = np.empty(len(curvas))
+            valores[~vazio] = resultado[:n_cheios]
+            valores[vazio] = (resultado[n_cheios:n_cheios + n_vazios] + resultado[n_cheios + n_vazios:]) / 2
+            saidas.append(valores)
+
+        return saidas
+
+    def _avaliar_motores(self, curvas, distancias):
+        # Trechos sem nenhuma regra ativa (possiveis com pontos ajustados) resultam em nao virar e manter a velocidade
+        return [np.nan_to_num(self.motores[saida].computar(curvas, distancias), nan=0.0) for saida in CONSEQUENTES]
+
+    def _amostrar_skfuzzy(self, curvas, distancias):
+        # Usa o modo vetorial do skfuzzy em simulacoes separadas para nao afetar virar_sim e velocidade_sim
+        from skfuzzy import control as ctrl
+
+        self._criar_control_system()
+        saidas = []
+        for control_system, saida in ((self.virar_ctrl, 'virar'), (self.velocidade_ctrl, 'velocidade')):
+            sim = ctrl.ControlSystemSimulation(control_system)
+            sim.input['curva'] = curvas
+            sim.input['distancia_borda'] = distancias
+            sim.compute()
+            saidas.append(np.asarray(sim.output[saida], dtype=np.float64))
+
+        return saidas
+
+    def computar_batch(self, curvas, distancias):
+        # Avalia varios pares (curva, distancia_borda) em uma unica passada do motor vetorial
+        curvas, distancias = np.broadcast_arrays(np.asarray(curvas, dtype=np.float64), np.asarray(distancias, dtype=np.float64))
+        virar, velocidade = self._avaliar_com_limites(self._avaliar_motores, curvas.ravel(), distancias.ravel())
+
+        return {
+            'virar': np.rint(virar).astype(int).reshape(curvas.shape),
+            'velocidade': velocidade.reshape(curvas.shape)
+        }
+
     def computar(self, curva_input, distancia_borda_input, gerar_relatorio=False):        
-        self.virar_sim.input['curva'] = curva_input
-        self.virar_sim.input['distancia_borda'] = distancia_borda_input
-        self.virar_sim.compute()
-        virar_output = self.virar_sim.output['virar']
-    
-        self.velocidade_sim.input['curva'] = curva_input
-        self.velocidade_sim.input['distancia_borda'] = distancia_borda_input
-        self.velocidade_sim.compute()
-        velocidade_output = self.velocidade_sim.output['velocidade']
+        # O relatorio mostra a inferencia completa, entao nao usa a superficie compilada
+        if self.superficie is not None and not gerar_relatorio:
+            virar_output, velocidade_output = self.superficie.avaliar(curva_input, distancia_borda_input)
+
+        elif self.motor == 'numpy':
+            virar, velocidade = self._avaliar_com_limites(
+                self._avaliar_motores, 
+                np.array([curva_input], dtype=np.float64), 
+                np.array([distancia_borda_input], dtype=np.float64)
+            )
+            virar_output, velocidade_output = float(virar[0]), float(velocidade[0])
+
+        else:
+            self._criar_control_system()
+
+            self.virar_sim.input['curva'] = curva_input
+            self.virar_sim.input['distancia_borda'] = distancia_borda_input
+            self.virar_sim.compute()
+            virar_output = self.virar_sim.output['virar']
+        
+            self.velocidade_sim.input['curva'] = curva_input
+            self.velocidade_sim.input['distancia_borda'] = distancia_borda_input
+            self.velocidade_sim.compute()
+            velocidade_output = self.velocidade_sim.output['velocidade']
     
         if gerar_relatorio:
             self._gerar_relatorio(
@@ -123,70 +492,314 @@ class FuzzyController:
         }
     
     def _gerar_relatorio(self, curva_input, distancia_borda_input, virar_output, velocidade_output):
-        relatorio = f"""
-        Relatório de Controle Fuzzy
-        ===========================
-        Entradas:
-            Curva: {curva_input:.0f}°
-            Distância da borda: {distancia_borda_input:.0f}px
-        
-        Saídas:
-            Virar: {virar_output:.2f} (Ação: {'Esquerda' if virar_output < 0 else 'Direita' if virar_output > 0 else 'Manter'})
-            Velocidade: {velocidade_output:.2f}
-        
-        Pertinência:
-            Curva:
-                Fechada Esq: {fuzz.interp_membership(self.curva.universe, self.curva['fechada_esq'].mf, curva_input):.2f}
-                Média Esq: {fuzz.interp_membership(self.curva.universe, self.curva['media_esq'].mf, curva_input):.2f}
-                Aberta Esq: {fuzz.interp_membership(self.curva.universe, self.curva['aberta_esq'].mf, curva_input):.2f}
-                Aberta Dir: {fuzz.interp_membership(self.curva.universe, self.curva['aberta_dir'].mf, curva_input):.2f}
-                Média Dir: {fuzz.interp_membership(self.curva.universe, self.curva['media_dir'].mf, curva_input):.2f}
-                Fechada Dir: {fuzz.interp_membership(self.curva.universe, self.curva['fechada_dir'].mf, curva_input):.2f}
-    
-            Distância da borda:
-                Perto: {fuzz.interp_membership(self.distancia_borda.universe, self.distancia_borda['perto'].mf, distancia_borda_input):.2f}
-                Médio: {fuzz.interp_membership(self.distancia_borda.universe, self.distancia_borda['medio'].mf, distancia_borda_input):.2f}
-                Longe: {fuzz.interp_membership(self.distancia_borda.universe, self.distancia_borda['longe'].mf, distancia_borda_input):.2f}
-    
-        """
-    
-        os.makedirs('output/snapshot', exist_ok=True)
-        with open("output/snapshot/relatorio_fuzzy.txt", "w") as file:
-            file.write(relatorio)
-    
-        print("[INFO] Relatório gerado com sucesso.")
-    
-        self._gerar_graficos(curva_input, distancia_borda_input, virar_output, velocidade_output)
-    
-    def _gerar_graficos(self, curva_input, distancia_borda_input, virar_output, velocidade_output):
-        self.curva.view(sim=self.virar_sim)
-        plt.title(f'Curva = {curva_input:.0f}°')
-        plt.savefig('output/snapshot/curva_fuzzy.png')
-        plt.close()
-    
-        self.distancia_borda.view(sim=self.velocidade_sim)
-        plt.title(f'Entrada: Distância da borda = {distancia_borda_input:.0f}px')
-        if distancia_borda_input <= 200:
-            plt.xlim(0, 200)
-        else:
-            plt.xlim(0, int(distancia_borda_input) + 100)
-        plt.savefig('output/snapshot/distancia_borda_fuzzy.png')
-        plt.close()
-    
-        self.virar.view(sim=self.virar_sim)
-        plt.title(f'Saída: Virar = {virar_output:.2f}')
-        plt.savefig('output/snapshot/virar_fuzzy.png')
-        plt.close()
-    
-        self.velocidade.view(sim=self.velocidade_sim)
-        plt.title(f'Saída: Velocidade = {velocidade_output:.2f}')
-        plt.savefig('output/snapshot/velocidade_fuzzy.png')
-        plt.close()
-    
-        print("[INFO] Gráficos gerados com sucesso.")
+        # O relatorio e os graficos sao gerados em segundo plano (relatorio.py), sem bloquear o laco do jogo
+        if self.relatorios is None:
+            from relatorio import FilaRelatorios
+
+            self.relatorios = FilaRelatorios({
+                'universos': self.universos,
+                'funcoes_pertinencia': self.funcoes_pertinencia,
+                'pertinencias': self.pertinencias,
+                'motores': self.motores
+            })
+
+        return self.relatorios.enviar(curva_input, distancia_borda_input, virar_output, velocidade_output)
+
+    def encerrar_relatorios(self):
+        # Espera os relatorios enfileirados serem gravados
+        if self.relatorios is not None:
+            self.relatorios.encerrar()
+
+class MotorMamdani:
+    # Inferencia de Mamdani vetorizada em NumPy, equivalente ao skfuzzy.control para regras com 'and' (min),
+    # acumulacao por max e defuzzificacao por centroide. Reproduz tambem a reamostragem do universo de saida
+    # feita pelo skfuzzy nos pontos onde cada termo cruza o seu nivel de corte
+    def __init__(self, universos, pertinencias, universo_saida, termos_saida, regras, consequentes, tamanho_bloco=4096):
+        self.universos = [np.asarray(universo, dtype=np.float64) for universo in universos]
+        self.pertinencias = [np.asarray(mfs, dtype=np.float64) for mfs in pertinencias]
+        self.universo_saida = np.asarray(universo_saida, dtype=np.float64)
+        self.termos_saida = np.asarray(termos_saida, dtype=np.float64)
+        self.tamanho_bloco = tamanho_bloco
+
+        # Cada regra e uma linha com o indice do termo de cada antecedente, e consequentes o indice do termo de saida
+        self.regras = np.asarray(regras, dtype=int)
+        self.consequentes = np.asarray(consequentes, dtype=int)
+
+        self.trechos = self._trechos_monotonos()
+
+    def _trechos_monotonos(self):
+        # Trechos estritamente monotonos de cada termo de saida, ordenados para np.interp(corte, pertinencia, x).
+        # Cada trecho cruza um nivel de corte em no maximo um ponto
+        trechos = []
+        for t, mf in enumerate(self.termos_saida):
+            sinais = np.sign(np.diff(mf))
+            inicio = 0
+            for k in range(1, len(sinais) + 1):
+                if k < len(sinais) and sinais[k] == sinais[inicio]:
+                    continue
+                if sinais[inicio] != 0:
+                    x = self.universo_saida[inicio:k + 1]
+                    y = mf[inicio:k + 1]
+                    if sinais[inicio] < 0:
+                        x, y = x[::-1], y[::-1]
+                    trechos.append((t, y, x))
+                inicio = k
+
+        return trechos
+
+    def computar(self, *entradas):
+        # Uma entrada por antecedente, limitadas ao universo como no skfuzzy. Retorna NaN onde nenhuma regra dispara
+        entradas = [
+            np.clip(np.asarray(valores, dtype=np.float64).ravel(), universo[0], universo[-1])
+            for valores, universo in zip(entradas, self.universos)
+        ]
+
+        n = len(entradas[0])
+        saida = np.empty(n)
+        for inicio in range(0, n, self.tamanho_bloco):
+            bloco = slice(inicio, inicio + self.tamanho_bloco)
+            saida[bloco] = self._computar_bloco([valores[bloco] for valores in entradas])
+
+        return saida
+
+    def cortes(self, *entradas):
+        # Nivel de ativacao de cada termo de saida (uma linha por entrada, uma coluna por termo)
+        entradas = [
+            np.clip(np.asarray(valores, dtype=np.float64).ravel(), universo[0], universo[-1])
+            for valores, universo in zip(entradas, self.universos)
+        ]
+        return self._cortes_bloco(entradas)
+
+    def _disparos_bloco(self, entradas):
+        # Ativacao de cada regra (uma linha por entrada, uma coluna por regra)
+        disparos = np.ones((len(entradas[0]), len(self.regras)))
+        for a, (universo, pertinencias, valores) in enumerate(zip(self.universos, self.pertinencias, entradas)):
+            graus = np.column_stack([np.interp(valores, universo, mf) for mf in pertinencias])
+            np.fmin(disparos, graus[:, self.regras[:, a]], out=disparos)
+
+        return disparos
+
+    def _cortes_bloco(self, entradas):
+        n = len(entradas[0])
+        disparos = self._disparos_bloco(entradas)
+
+        cortes = np.zeros((n, len(self.termos_saida)))
+        for t in range(len(self.termos_saida)):
+            regras_termo = self.consequentes == t
+            if regras_termo.any():
+                cortes[:, t] = disparos[:, regras_termo].max(axis=1)
+
+        return cortes
+
+    def _computar_bloco(self, entradas):
+        n = len(entradas[0])
+        cortes = self._cortes_bloco(entradas)
+
+        # Universo de saida reamostrado: pontos originais mais os cruzamentos de cada termo com o seu corte.
+        # Cortes fora de um trecho caem em pontos ja existentes e geram segmentos de largura zero, que nao contam
+        cruzamentos = np.column_stack([np.interp(cortes[:, t], y, x) for t, y, x in self.trechos])
+        pontos = np.sort(np.concatenate([np.broadcast_to(self.universo_saida, (n, len(self.universo_saida))), cruzamentos], axis=1), axis=1)
+
+        agregado = np.zeros_like(pontos)
+        for t, mf in enumerate(self.termos_saida):
+            np.fmax(agregado, np.fmin(cortes[:, t, None], np.interp(pontos, self.universo_saida, mf)), out=agregado)
+
+        # Centroide exato da funcao linear por partes, como em skfuzzy.defuzzify.centroid
+        largura = np.diff(pontos, axis=1)
+        y1, y2 = agregado[:, :-1], agregado[:, 1:]
+        area = 0.5 * largura * (y1 + y2)
+        momento = area * pontos[:, :-1] + largura * largura * (y2 + 0.5 * y1) / 3
+
+        resultado = momento.sum(axis=1) / np.fmax(area.sum(axis=1), np.finfo(float).eps)
+        resultado[agregado.sum(axis=1) == 0] = np.nan
+
+        return resultado
+
+class MotorSugeno(MotorMamdani):
+    # Sugeno de ordem zero: cada termo de saida vira um singleton, o centroide da sua funcao de pertinencia
+    # (assim as saidas ficam proximas das do Mamdani), e a saida e a media dos singletons das regras ponderada
+    # pela ativacao de cada regra
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        largura = np.diff(self.universo_saida)
+        y1, y2 = self.termos_saida[:, :-1], self.termos_saida[:, 1:]
+        area = 0.5 * largura * (y1 + y2)
+        momento = area * self.universo_saida[:-1] + largura * largura * (y2 + 0.5 * y1) / 3
+        self.singletons = momento.sum(axis=1) / area.sum(axis=1)
+        self.valores_regras = self.singletons[self.consequentes]
+
+    def _computar_bloco(self, entradas):
+        disparos = self._disparos_bloco(entradas)
+        soma = disparos.sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado = disparos @ self.valores_regras / soma
+        resultado[soma == 0] = np.nan
+
+        return resultado
+
+class SuperficieCompilada:
+    def __init__(self, eixo_curva, eixo_distancia, virar, velocidade):
+        self.eixo_curva = eixo_curva
+        self.eixo_distancia = eixo_distancia
+        self.virar = virar
+        self.velocidade = velocidade
+
+        # Escalares em Python puro deixam a interpolacao de um unico ponto mais rapida que operacoes do NumPy
+        self.curva_min, self.curva_max = float(eixo_curva[0]), float(eixo_curva[-1])
+        self.distancia_min, self.distancia_max = float(eixo_distancia[0]), float(eixo_distancia[-1])
+        self.passo_curva = (self.curva_max - self.curva_min) / (len(eixo_curva) - 1)
+        self.passo_distancia = (self.distancia_max - self.distancia_min) / (len(eixo_distancia) - 1)
+        self.ultima_celula = (len(eixo_curva) - 2, len(eixo_distancia) - 2)
+
+    def avaliar(self, curva, distancia):
+        # Interpolacao bilinear, com as entradas limitadas ao intervalo da grade
+        u = (min(max(curva, self.curva_min), self.curva_max) - self.curva_min) / self.passo_curva
+        v = (min(max(distancia, self.distancia_min), self.distancia_max) - self.distancia_min) / self.passo_distancia
+
+        i = min(int(u), self.ultima_celula[0])
+        j = min(int(v), self.ultima_celula[1])
+        fu, fv = u - i, v - j
+
+        resultado = []
+        for tabela in (self.virar, self.velocidade):
+            topo = tabela[i, j] + (tabela[i, j + 1] - tabela[i, j]) * fv
+            base = tabela[i + 1, j] + (tabela[i + 1, j + 1] - tabela[i + 1, j]) * fv
+            resultado.append(float(topo + (base - topo) * fu))
+
+        return resultado
+
+    def memoria(self):
+        return self.virar.nbytes + self.velocidade.nbytes
+
+def carregar_npz_mapeado(arquivo):
+    # np.load ignora mmap_mode para .npz, entao cada array e mapeado direto do arquivo: o np.savez grava os .npy
+    # sem compressao, e basta achar o inicio dos dados de cada um dentro do zip
+    arrays = {}
+    with zipfile.ZipFile(arquivo) as pacote, open(arquivo, 'rb') as file:
+        for info in pacote.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f'{info.filename} esta comprimido')
+
+            # Cabecalho local do zip: 30 bytes fixos, mais o nome e o campo extra
+            file.seek(info.header_offset + 26)
+            tamanho_nome, tamanho_extra = np.frombuffer(file.read(4), dtype='<u2')
+            file.seek(info.header_offset + 30 + int(tamanho_nome) + int(tamanho_extra))
+
+            versao = np.lib.format.read_magic(file)
+            if versao == (1, 0):
+                forma, fortran, dtype = np.lib.format.read_array_header_1_0(file)
+            elif versao == (2, 0):
+                forma, fortran, dtype = np.lib.format.read_array_header_2_0(file)
+            else:
+                raise ValueError(f'{info.filename} usa a versao {versao} do formato .npy')
+            if dtype.hasobject:
+                raise ValueError(f'{info.filename} contem objetos')
+
+            nome = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if not np.prod(forma):
+                arrays[nome] = np.zeros(forma, dtype=dtype)
+                continue
+
+            # np.asarray tira a subclasse memmap (mais lenta para acessar elemento a elemento) sem copiar os dados
+            arrays[nome] = np.asarray(np.memmap(arquivo, dtype=dtype, mode='r', offset=file.tell(), shape=forma, order='F' if fortran else 'C'))
+
+    return arrays
+
+def verificar_motor(amostras=2000, semente=0):
+    # Confere que o MotorMamdani reproduz o skfuzzy.control dentro de TOLERANCIA_MOTOR; retorna se passou
+    diferencas = FuzzyController().comparar_motor(amostras, semente)
+    passou = all(diferenca <= TOLERANCIA_MOTOR for diferenca in diferencas.values())
+
+    for saida, diferenca in diferencas.items():
+        print(f"  {saida:<10} maior diferenca {diferenca:.3e}")
+    print(f"[INFO] Motor numpy {'igual ao' if passou else 'DIFERENTE do'} skfuzzy ({amostras} amostras, tolerancia {TOLERANCIA_MOTOR:g})")
+    return passou
+
+def comparar_sugeno(amostras=20000, semente=0, repeticoes=2000):
+    # Diferenca entre as saidas Sugeno e Mamdani em pontos aleatorios e o ganho de tempo, em lote e por chamada
+    mamdani = FuzzyController()
+    sugeno = FuzzyController(inferencia='sugeno')
+
+    rng = np.random.default_rng(semente)
+    curvas = rng.uniform(mamdani.universos['curva'][0], mamdani.universos['curva'][-1], amostras)
+    distancias = rng.uniform(0, 250, amostras)
+
+    resultados = {}
+    for saida, valores_mamdani, valores_sugeno in zip(
+        CONSEQUENTES,
+        mamdani._avaliar_com_limites(mamdani._avaliar_motores, curvas, distancias),
+        sugeno._avaliar_com_limites(sugeno._avaliar_motores, curvas, distancias)
+    ):
+        diferenca = np.abs(valores_sugeno - valores_mamdani)
+        resultados[saida] = {'max': float(diferenca.max()), 'media': float(diferenca.mean())}
+
+    # Virar e arredondado em computar: quantas acoes de virar mudam
+    resultados['acoes_virar_diferentes'] = float(np.mean(
+        mamdani.computar_batch(curvas, distancias)['virar'] != sugeno.computar_batch(curvas, distancias)['virar']
+    ))
+
+    tempos = {}
+    for nome, controle in (('mamdani', mamdani), ('sugeno', sugeno)):
+        inicio = time.perf_counter()
+        controle.computar_batch(curvas, distancias)
+        tempo_lote = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for c, d in zip(curvas[:repeticoes], distancias[:repeticoes]):
+            controle.computar(c, d)
+        tempos[nome] = (tempo_lote, (time.perf_counter() - inicio) / repeticoes)
+
+    print(f'Diferenca Sugeno x Mamdani em {amostras} pontos:')
+    for saida in CONSEQUENTES:
+        print(f"  {saida:<11} max {resultados[saida]['max']:.4f}   media {resultados[saida]['media']:.4f}")
+    print(f"  acoes de virar diferentes: {resultados['acoes_virar_diferentes'] * 100:.2f}%")
+    print('Tempo:')
+    for nome, (tempo_lote, tempo_chamada) in tempos.items():
+        print(f'  {nome:<8} lote {tempo_lote * 1000:8.2f} ms   computar {tempo_chamada * 1e6:8.1f} us')
+    print(f"  ganho: lote {tempos['mamdani'][0] / tempos['sugeno'][0]:.1f}x, computar {tempos['mamdani'][1] / tempos['sugeno'][1]:.1f}x")
+
+    resultados['tempos'] = tempos
+    return resultados
+
+def imprimir_tempos_inicializacao():
+    inicio = time.perf_counter()
+    fuzzy = FuzzyController()
+    tempo_construtor = time.perf_counter() - inicio
+
+    print(f'Importacao do numpy: {TEMPO_IMPORTACAO * 1000:8.1f} ms')
+    print(f'FuzzyController():   {tempo_construtor * 1000:8.1f} ms')
+    for etapa, tempo in fuzzy.tempos_inicializacao.items():
+        print(f'  {etapa:<19}{tempo * 1000:8.1f} ms')
+
+    etapas_sob_demanda = [
+        ('Primeiro computar', lambda: fuzzy.computar(30, 70)),
+        ('Compilacao', lambda: fuzzy.compilar(validar=False)),
+        ('skfuzzy + matplotlib', fuzzy._criar_control_system),
+    ]
+    print('Sob demanda:')
+    for etapa, funcao in etapas_sob_demanda:
+        inicio = time.perf_counter()
+        funcao()
+        print(f'  {etapa:<19}{(time.perf_counter() - inicio) * 1000:8.1f} ms')
 
 if __name__ == '__main__':
+    if '--tempos' in sys.argv:
+        imprimir_tempos_inicializacao()
+        sys.exit()
+
+    if '--comparar-motor' in sys.argv:
+        sys.exit(0 if verificar_motor() else 1)
+
+    if '--comparar-sugeno' in sys.argv:
+        comparar_sugeno()
+        sys.exit()
+
+    import matplotlib.pyplot as plt
+
     fuzzy = FuzzyController()
+    fuzzy._criar_control_system()
 
     os.makedirs('output/demo', exist_ok=True)
 
@@ -212,3 +825,4 @@ if __name__ == '__main__':
     plt.close()
 
     resultado = fuzzy.computar(30, 70, gerar_relatorio=True)
+    fuzzy.encerrar_relatorios()
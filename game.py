@@ -1,62 +1,186 @@
 import pygame
+import os
 import sys
 import math
 import random
 import time
+from collections import OrderedDict
+import numpy as np
 
 class GameLoop:
-    def __init__(self):
+    def __init__(self, headless=False, dt=1 / 60, seed=None, dirty_rects=False, frame_timing=None, timing_export=None, track=None,
+                 physics_rate=None, capture=None, capture_every=1):
+        # No modo headless nao ha janela, renderizacao nem limite de fps, e o tempo e simulado em passos fixos de dt.
+        # Com dirty_rects so as regioes que mudaram sao redesenhadas e enviadas para a tela.
+        # frame_timing mede o tempo de cada fase do frame (ligado por padrao com janela) e timing_export grava
+        # os tempos de cada frame em um arquivo .csv ou .npy.
+        # track e uma pista (track.Track ou o caminho do arquivo) com o tamanho da arena, obstaculos e alvos.
+        # physics_rate (Hz) separa a fisica da renderizacao: com janela, um acumulador roda quantos passos fixos
+        # couberem no tempo real de cada frame e o carro e desenhado interpolado entre os dois ultimos estados.
+        # Sem physics_rate, um passo de fisica por frame, como antes.
+        # capture grava os frames (pasta de PNGs ou video bruto .rgb, ver capture.FrameCapture), um a cada
+        # capture_every; no modo headless a cena e desenhada em uma superficie fora da tela so para a captura
         pygame.init()
 
-        self.WIDTH, self.HEIGHT = 1000, 600
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT), pygame.RESIZABLE)
-        pygame.display.set_caption("Drifter")
+        self.headless = headless
+        self.dt = 1 / physics_rate if headless and physics_rate else dt
+        self.physics_rate = physics_rate
+        self.accumulator = 0
+        self.interpolation = 1
+        self.physics_steps = 0
+        self.last_frame_time = None
+        self.sim_time = 0
+        self.tick_count = 0
+
+        if isinstance(track, str):
+            from track import load_track
+            track = load_track(track)
+        self.track = track
+
+        self.WIDTH, self.HEIGHT = (track.width, track.height) if track else (1000, 600)
+        if not self.headless:
+            self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT), pygame.RESIZABLE)
+            pygame.display.set_caption("Drifter")
+        elif capture:
+            self.screen = pygame.Surface((self.WIDTH, self.HEIGHT))
 
         self.clock = pygame.time.Clock()
 
-        self.player = Player(self.WIDTH // 2, self.HEIGHT // 2, self.WIDTH, self.HEIGHT)
-        self.target = Target(self.WIDTH, self.HEIGHT)
+        self.player = Player(self.WIDTH // 2, self.HEIGHT // 2, self.WIDTH, self.HEIGHT, get_time=self.now, render=not self.headless or bool(capture))
+        self.target = Target(self.WIDTH, self.HEIGHT, get_time=self.now, rng=random.Random(seed),
+                             positions=track.targets if track else None)
+
+        if physics_rate:
+            # Os valores por passo (deslocamento, giro, aceleracao) foram definidos para 60 passos por segundo
+            self.player.time_scale = self.target.time_scale = 60 / physics_rate
+
+        if track:
+            self.player.set_pose(*track.start)
+            self.player.obstacles = track.grid
+
+        if not self.headless or capture:
+            self.bg = self.build_bg()
 
-        self.bg_image = pygame.image.load('sprites/floor.jpg')
-        self.bg = self.crop_bg()
+        self.capture = None
+        if capture:
+            from capture import FrameCapture
+            self.capture = FrameCapture(capture, (self.WIDTH, self.HEIGHT), every=capture_every,
+                                        fps=1 / self.dt if self.headless else 60, block=self.headless)
+
+        if frame_timing is None:
+            frame_timing = not headless or timing_export is not None
+        self.frame_timer = FrameTimer(export_path=timing_export) if frame_timing else None
+
+        self.dirty_rects = dirty_rects
+        self.drawn_rects = []
+        self.full_redraw = True
 
         self.running = True
-        self.paused = True
+        self.paused = not self.headless
         self.debug_mode = False
 
         self.s_font = pygame.font.Font(None, 24)
         self.m_font = pygame.font.Font(None, 36)
+        self.text_cache = TextCache()
 
         self.take_snapshot = False
 
-    def crop_bg(self):
-        image_width, image_height = self.bg_image.get_size()
+        # Controlador assincrono (scheduling.ControllerRunner); quando definido, a sua ultima acao e aplicada a cada tick
+        self.controller = None
+        # Controlador chamado a cada passo de fisica: recebe a observacao e retorna a acao (como em step)
+        self.policy = None
 
-        # Calcular a posição do recorte (centro da imagem)
-        x = (image_width - self.WIDTH) // 2
-        y = (image_height - self.HEIGHT) // 2
+        # Sensores calculados uma vez por estado do carro e do alvo (ver observe)
+        self.observation = Observation()
+        self.observation_key = None
 
-        cropped_bg = self.bg_image.subsurface((x, y, self.WIDTH, self.HEIGHT))
-        
-        return cropped_bg
+    def build_bg(self):
+        # Fundo da janela com os obstaculos da pista ja desenhados (a superficie do Assets e compartilhada, entao e copiada)
+        bg = assets.background(self.WIDTH, self.HEIGHT)
+        if self.track:
+            bg = bg.copy()
+            self.track.grid.draw(bg)
+        return bg
 
     def draw_text(self, *texts, x=0, y=0, color=(0, 0, 0), line_spacing=5):
-        for text in texts:
-            text_surface = self.s_font.render(text, True, color)
-            self.screen.blit(text_surface, (x, y))
-            y += text_surface.get_height() + line_spacing
+        # As linhas sao compostas em uma unica superficie, refeita so quando algum texto exibido muda
+        text_surface = self.text_cache.render_lines(self.s_font, texts, color, line_spacing)
+        return [self.screen.blit(text_surface, (x, y))]
 
     def draw_interface(self):
         speedometer = self.player.get_speedometer()
-        speedometer_text = self.m_font.render('Velocímetro', True, (0, 0, 0))
+        speedometer_text = self.text_cache.render(self.m_font, 'Velocímetro', (0, 0, 0))
+
+        return [
+            self.screen.blit(speedometer, (0, self.HEIGHT - speedometer.get_height())),
+            self.screen.blit(speedometer_text, (0, self.HEIGHT - speedometer.get_height() - speedometer_text.get_height()))
+        ]
+
+    def draw(self):
+        # Desenha a cena e retorna os retangulos alterados na tela
+        rects = []
+
+        if self.debug_mode:
+            rects += self.target.draw_debug(self.screen)
+            observation = self.observe()
+            rects += self.player.draw_debug(self.screen, self.target, (observation.wall_x, observation.wall_y))
+
+        rects += self.target.draw(self.screen)
+        rects += self.player.draw(self.screen, self.interpolation if self.physics_rate else 1)
+
+        rects += self.draw_interface()
+
+        if self.debug_mode:
+            rects += self.draw_text(
+                f'Distancia da parede: {self.get_distance_to_wall():.0f}',
+                f'Angulo do objetivo: {self.get_angle_to_target():.0f}°',
+                f'Velocidade atual: {self.player.speed:.2f}',
+                f'Cache de rotacao: {(self.player.car_rotations.memory_bytes() + self.player.tire_rotations.memory_bytes()) / 1024:.0f} KB',
+                *(self.frame_timer.summary() if self.frame_timer else ()),
+                *(self.controller.summary() if self.controller else ()),
+                x=2, y=2)
+            
+        if self.paused:
+            paused_text = self.text_cache.render(self.m_font, 'simulação pausada', (255, 255, 255))
+            snapshot_text = self.text_cache.render(self.s_font, 'R para gerar relatório', (255, 255, 255))
 
-        self.screen.blit(speedometer, (0, self.HEIGHT - speedometer.get_height()))
-        self.screen.blit(speedometer_text, (0, self.HEIGHT - speedometer.get_height() - speedometer_text.get_height()))
+            rects.append(self.screen.blit(paused_text, (self.WIDTH / 2 - paused_text.get_width() / 2, 15)))
+            rects.append(self.screen.blit(snapshot_text, (self.WIDTH / 2 - snapshot_text.get_width() / 2, self.HEIGHT - snapshot_text.get_height() - 7)))
+
+        return rects
+
+    def now(self):
+        return self.sim_time if self.headless else time.time()
 
     def tick(self):
+        timer = self.frame_timer
+        if timer:
+            # O que rodou entre o fim do frame anterior e agora e o controlador (main.py)
+            timer.lap('control')
+
+        if self.headless:
+            self.physics_step()
+
+            if self.capture:
+                if self.capture.due():
+                    self.screen.blit(self.bg, (0, 0))
+                    self.draw()
+                    self.capture.grab(self.screen)
+                else:
+                    self.capture.skip()
+
+            self.sim_time += self.dt
+            self.tick_count += 1
+
+            if timer:
+                timer.lap('update')
+                timer.end_frame()
+            return
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+                self.close()
             elif event.type == pygame.VIDEORESIZE:
                 self.WIDTH, self.HEIGHT = event.w, event.h
                 self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT), pygame.RESIZABLE)
@@ -64,7 +188,11 @@ class GameLoop:
                 self.player.update_boundaries(self.WIDTH, self.HEIGHT)
                 self.target.update_boundaries(self.WIDTH, self.HEIGHT)
 
-                self.bg = self.crop_bg()
+                self.bg = self.build_bg()
+                self.full_redraw = True
+
+            elif event.type == pygame.WINDOWEXPOSED:
+                self.full_redraw = True
 
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_d:
@@ -83,40 +211,79 @@ class GameLoop:
                 elif event.key == pygame.K_SPACE:
                     self.paused = not self.paused
 
-        if not self.paused:
-            self.player.update()
-            self.target.update(self.player)
-
-        self.screen.blit(self.bg, (0, 0))
+        if timer:
+            timer.lap('events')
+
+        if self.physics_rate:
+            # Passos fixos pelo tempo real decorrido; o limite evita uma rajada de passos depois de uma pausa longa
+            now = time.perf_counter()
+            if self.last_frame_time is not None and not self.paused:
+                self.accumulator += min(now - self.last_frame_time, 0.25)
+            self.last_frame_time = now
+
+            step = 1 / self.physics_rate
+            while self.accumulator >= step:
+                self.physics_step()
+                self.accumulator -= step
+            # Ate o primeiro passo nao ha estado anterior para interpolar (o jogo comeca pausado)
+            self.interpolation = self.accumulator / step if self.physics_steps else 1
+        else:
+            self.physics_step()
 
-        if self.debug_mode:
-            self.target.draw_debug(self.screen)
-            self.player.draw_debug(self.screen, self.target)
+        if timer:
+            timer.lap('update')
 
-        self.target.draw(self.screen)
-        self.player.draw(self.screen)
+        if self.dirty_rects and not self.full_redraw:
+            # Apaga o que foi desenhado no frame anterior, deixando a tela igual ao fundo antes de desenhar de novo
+            for rect in self.drawn_rects:
+                self.screen.blit(self.bg, rect, rect)
 
-        self.draw_interface()
+            rects = self.draw()
+            if timer:
+                timer.lap('draw')
+            pygame.display.update(self.drawn_rects + rects)
+        else:
+            self.screen.blit(self.bg, (0, 0))
+            rects = self.draw()
+            if timer:
+                timer.lap('draw')
+            pygame.display.flip()
 
-        if self.debug_mode:
-            self.draw_text(
-                f'Distancia da parede: {self.get_distance_to_wall():.0f}',
-                f'Angulo do objetivo: {self.get_angle_to_target():.0f}°',
-                f'Velocidade atual: {self.player.speed:.2f}',
-                x=2, y=2)
-            
-        if self.paused:
-            paused_text = self.m_font.render('simulação pausada', True, (255, 255, 255))
-            snapshot_text = self.s_font.render('R para gerar relatório', True, (255, 255, 255))
+        if self.capture:
+            self.capture.grab(self.screen)
 
-            self.screen.blit(paused_text, (self.WIDTH / 2 - paused_text.get_width() / 2, 15))
-            self.screen.blit(snapshot_text, (self.WIDTH / 2 - snapshot_text.get_width() / 2, self.HEIGHT - snapshot_text.get_height() - 7))
+        if timer:
+            timer.lap('flip')
 
-        pygame.display.flip()
+        self.drawn_rects = rects
+        self.full_redraw = False
         self.clock.tick(60)
+        self.tick_count += 1
+
+        if timer:
+            timer.lap('wait')
+            timer.end_frame()
+
+    def physics_step(self):
+        if self.controller:
+            self.controller.apply(self)
+        if self.policy:
+            self.apply_action(self.policy(self.observe()))
+
+        if not self.paused:
+            self.player.update()
+            self.target.update(self.player)
+            self.physics_steps += 1
 
     def is_running(self):
         return self.running
+
+    def close(self):
+        # Fecha os arquivos de tempos e de captura (chamado ao fechar a janela; no modo headless, por quem roda o jogo)
+        if self.frame_timer:
+            self.frame_timer.close()
+        if self.capture:
+            self.capture.close()
     
     def requested_snapshot(self):
         # Considera que o retorno de true foi identificado e a snapshot foi tirada
@@ -125,12 +292,53 @@ class GameLoop:
             return True
         return False
 
+    def observe(self):
+        # Todos os sensores de uma vez, recalculados so quando o carro, o alvo ou a arena mudam; leituras repetidas
+        # no mesmo tick (controlador, overlay de debug, gravacao) reaproveitam o mesmo registro
+        player, target = self.player, self.target
+        key = (self.tick_count, player.x, player.y, player.angle, player.speed, target.rect.x, target.rect.y, player.WIDTH, player.HEIGHT)
+        observation = self.observation
+        if key == self.observation_key:
+            return observation
+
+        observation.wall_x, observation.wall_y, observation.distance_to_wall = player.cast_ray()
+        observation.angle_to_target = player.calculate_angle_to_target(target.rect.center)
+        observation.tick = self.tick_count
+        observation.x, observation.y = player.x, player.y
+        observation.angle = player.angle
+        observation.speed = player.speed
+        self.observation_key = key
+        return observation
+
+    def step(self, action=None):
+        # Aplica a acao (saida do computar ou (virar, velocidade)) e avanca um tick, retornando a nova observacao
+        if action is not None:
+            self.apply_action(action)
+
+        self.tick()
+        return self.observe()
+
+    def apply_action(self, action):
+        if isinstance(action, dict):
+            turn, speed_change = action['virar'], action['velocidade']
+        else:
+            turn, speed_change = action
+
+        if not self.paused:
+            if turn > 0:
+                self.player.rotate('right')
+            elif turn < 0:
+                self.player.rotate('left')
+            self.player.change_speed_by(speed_change)
+
     def get_distance_to_wall(self):
-        _, _, distance = self.player.cast_ray()
-        return distance
+        return self.observe().distance_to_wall
+
+    def get_sensor_distances(self, rays=5, spread=120):
+        return self.player.sensor_fan(rays, spread)
 
     def get_angle_to_target(self):
-        return self.player.calculate_angle_to_target(self.target.rect.center)
+        return self.observe().angle_to_target
 
     def rotate(self, direction):
         if self.paused:
@@ -144,8 +352,23 @@ class GameLoop:
         
         self.player.change_speed_by(amount)
 
+class Observation:
+    # Leituras de sensores de um tick. O GameLoop reaproveita a mesma instancia, entao quem precisar guardar
+    # os valores entre ticks deve copia-los
+    __slots__ = ('tick', 'angle_to_target', 'distance_to_wall', 'wall_x', 'wall_y', 'x', 'y', 'angle', 'speed')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
 class Player:
-    def __init__(self, x, y, width, height):
+    def __init__(self, x, y, width, height, get_time=time.time, render=True, rotation_step=1, exact_rotation=False):
+        self.get_time = get_time
+        self.render = render
+
         self.x = x
         self.y = y
         self.WIDTH = width
@@ -155,9 +378,8 @@ class Player:
         self.min_speed = 5
         self.max_speed = 20
 
-        car_sprite = pygame.image.load("sprites/car.png")
-        car_sprite = pygame.transform.scale(car_sprite, (49, 25))
-        self.image = car_sprite
+        # Sprites compartilhados entre todos os Players do processo (ver Assets)
+        self.image = assets.image('car.png', (49, 25))
         self.original_image = self.image
 
         self.rect = self.image.get_rect(center=(self.x, self.y))
@@ -170,11 +392,30 @@ class Player:
         self.target_drift_factor = 0
         self.drift_count = 0
 
-        self.tires_sprite = pygame.image.load("sprites/tires.png")
-        self.tires_sprite = pygame.transform.scale(self.tires_sprite, (49, 25))
-        self.drift_sprites = []
+        self.tires_sprite = assets.image('tires.png', (49, 25))
+
+        # Sprites pre-rotacionados; o dos pneus so e usado nas marcas de drift, que exigem renderizacao
+        self.car_rotations = assets.rotations('car.png', (49, 25), rotation_step, exact_rotation, prerender=render)
+        self.tire_rotations = assets.rotations('tires.png', (49, 25), rotation_step, exact_rotation, prerender=render)
+        self.skid_marks = SkidMarks()
+
+        self.speedometer_sprite = assets.image('speedometer.jpg')
+        self.speedometer_crops = {}
+
+        # Obstaculos da pista (track.ObstacleGrid), usados nos raios e nas colisoes
+        self.obstacles = None
 
-        self.speedometer_sprite = pygame.image.load("sprites/speedometer.jpg")
+        # Fracao de um passo de 1/60 s que cada passo representa (menor que 1 com fisica acima de 60 Hz)
+        self.time_scale = 1
+        # Posicao e angulo desenhado antes do ultimo update, para desenhar interpolado
+        self.previous_state = (x, y, 0)
+
+    def set_pose(self, x, y, angle):
+        # Posiciona o carro de fora (ex.: largada da pista); o estado anterior tambem, para nao interpolar a partir
+        # da pose antiga
+        self.x, self.y, self.angle = x, y, angle
+        self.update_sprite()
+        self.previous_state = (self.x, self.y, self.angle + self.drift_factor)
 
     def rotate(self, direction):
         amount = 5 * (1 - (self.speed - self.min_speed) / self.max_speed) ** 2 # Quando mais lento, mais vira
@@ -193,13 +434,9 @@ class Player:
                 self.target_drift_factor = 0
         else:
             self.target_drift_factor = 0
-            if len(self.drift_sprites) > 0:
-                now = time.time()
-                for s in self.drift_sprites:
-                    if not s['time']:
-                        s['time'] = now
+            self.skid_marks.release_all(self.get_time())
 
-        self.angle = (self.angle + amount) % 360
+        self.angle = (self.angle + amount * self.time_scale) % 360
         
     def change_speed_by(self, amount):
         if amount < -0.7:
@@ -207,26 +444,72 @@ class Player:
         else:
             self.braked_hard = False
 
-        self.speed = max(self.min_speed, min(self.speed + amount, self.max_speed))
+        self.speed = max(self.min_speed, min(self.speed + amount * self.time_scale, self.max_speed))
 
     def move(self):
         # Move na direcao do angulo atual
+        # (se o sprite ja encosta em um obstaculo, por ter girado, o carro pode sair dali)
+        can_collide = self.obstacles and not self.obstacles.collides(self.rect)
+
         radians = math.radians(-self.angle)
-        dx = math.cos(radians) * self.speed
-        dy = math.sin(radians) * self.speed
+        dx = math.cos(radians) * self.speed * self.time_scale
+        dy = math.sin(radians) * self.speed * self.time_scale
         self.x += dx
         self.y -= dy
         self.rect.center = (self.x, self.y)
 
+        # Bater em um obstaculo desfaz o movimento e reduz a velocidade ao minimo
+        if can_collide and self.obstacles.collides(self.rect):
+            self.x -= dx
+            self.y += dy
+            self.rect.center = (self.x, self.y)
+            self.speed = self.min_speed
+
     def cast_ray(self):
-        # Emite um raio para calcular a distancia da parede
-        radians = math.radians(-self.angle)
-        x, y = self.x, self.y
-        while 0 < x < self.WIDTH and 0 < y < self.HEIGHT:
-            x += math.cos(radians)
-            y -= math.sin(radians)
-        distance = math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
-        return x, y, distance
+        # Emite um raio para calcular a distancia da parede (intersecao analitica com o retangulo da arena)
+        if not (0 < self.x < self.WIDTH and 0 < self.y < self.HEIGHT):
+            return self.x, self.y, 0
+
+        radians = math.radians(self.angle)
+        dx, dy = math.cos(radians), math.sin(radians)
+
+        distance = math.inf
+        if dx > 0:
+            distance = (self.WIDTH - self.x) / dx
+        elif dx < 0:
+            distance = -self.x / dx
+        if dy > 0:
+            distance = min(distance, (self.HEIGHT - self.y) / dy)
+        elif dy < 0:
+            distance = min(distance, -self.y / dy)
+
+        if self.obstacles:
+            distance = self.obstacles.cast_ray(self.x, self.y, self.angle, distance)
+
+        return self.x + dx * distance, self.y + dy * distance, distance
+
+    def cast_rays(self, angles):
+        # Emite um raio para cada angulo relativo a direcao do carro (graus, positivo para a direita)
+        radians = np.radians(self.angle + np.asarray(angles, dtype=np.float64))
+        dx, dy = np.cos(radians), np.sin(radians)
+
+        with np.errstate(divide='ignore'):
+            distance_x = np.where(dx > 0, (self.WIDTH - self.x) / dx, np.where(dx < 0, -self.x / dx, np.inf))
+            distance_y = np.where(dy > 0, (self.HEIGHT - self.y) / dy, np.where(dy < 0, -self.y / dy, np.inf))
+        distances = np.minimum(distance_x, distance_y)
+
+        if not (0 < self.x < self.WIDTH and 0 < self.y < self.HEIGHT):
+            distances[:] = 0
+        elif self.obstacles:
+            for i, angle in enumerate(np.asarray(angles, dtype=np.float64)):
+                distances[i] = self.obstacles.cast_ray(self.x, self.y, self.angle + angle, distances[i])
+
+        return self.x + dx * distances, self.y + dy * distances, distances
+
+    def sensor_fan(self, rays=5, spread=120):
+        # Distancias ate a parede para um leque de raios, ex.: 5 raios de -60 a +60 graus
+        _, _, distances = self.cast_rays(np.linspace(-spread / 2, spread / 2, rays))
+        return distances
 
     def calculate_angle_to_target(self, target_position):
         # Calcula quantos graus o player deve virar para ficar de frente para o alvo (-180, 180)
@@ -241,12 +524,16 @@ class Player:
     def get_speedometer(self):
         width, height = self.speedometer_sprite.get_size()
         visible_width = int((self.speed / self.max_speed) * width)
-        crop_rect = pygame.Rect(0, 0, visible_width, height)        
-        cropped_image = self.speedometer_sprite.subsurface(crop_rect)
+
+        # O recorte so muda quando a largura visivel muda, entao a subsurface e reaproveitada entre frames
+        if visible_width not in self.speedometer_crops:
+            crop_rect = pygame.Rect(0, 0, visible_width, height)        
+            self.speedometer_crops[visible_width] = self.speedometer_sprite.subsurface(crop_rect)
         
-        return cropped_image
+        return self.speedometer_crops[visible_width]
     
     def update(self):
+        self.previous_state = (self.x, self.y, self.angle + self.drift_factor)
         self.move()
 
         if self.speed > 7.5: 
@@ -254,61 +541,379 @@ class Player:
 
         # Update drift factor
         if self.target_drift_factor < self.drift_factor:
-            self.drift_factor -= 2
+            self.drift_factor -= 2 * self.time_scale
         elif self.target_drift_factor > self.drift_factor:
-            self.drift_factor += 2
+            self.drift_factor += 2 * self.time_scale
 
-        # Update sprite according to drift factor
-        self.image = pygame.transform.rotate(self.original_image, -(self.angle + self.drift_factor))
-        self.rect = self.image.get_rect(center=(self.x, self.y))
+        self.update_sprite()
+
+        # Create drift marks (apenas visuais, entao sao ignoradas sem renderizacao)
+        if self.drift_factor and self.render:
+            tire_image = self.tire_rotations.get(self.angle + self.drift_factor)
+            self.skid_marks.add(tire_image, tire_image.get_rect(center=(self.x, self.y)).topleft, self.drift_count)
+
+        self.skid_marks.update(self.get_time(), self.drift_count)
+
+    def update_sprite(self):
+        # Update sprite according to drift factor. O sprite vem do cache (angulo quantizado) e so e usado para desenhar;
+        # o rect, usado nas colisoes com o alvo e as paredes, tem o tamanho da rotacao exata, como sem o cache
+        angle = self.angle + self.drift_factor
+        if self.render:
+            self.image = self.car_rotations.get(angle)
+        self.rect = pygame.Rect((0, 0), rotated_size(*self.original_image.get_size(), -angle))
+        self.rect.center = (self.x, self.y)
 
-        # Create drift marks
-        if self.drift_factor:
-            tire_image = pygame.transform.rotate(self.tires_sprite, -(self.angle + self.drift_factor))
-            self.drift_sprites.append({
-                'sprite': tire_image,
-                'dest': self.rect.topleft,
-                'time': 0,
-                'count': self.drift_count
-            })
-
-        # Update drift sprites
-        dead_drift_sprites = []
-        for s in self.drift_sprites:
-            now = time.time()
-
-            if s['time']:
-                time_elapsed = time.time() - s['time']
-                if time_elapsed > 5:
-                    dead_drift_sprites.append(s)
-                elif time_elapsed > 1:
-                    s['sprite'].set_alpha(255 * (1 - time_elapsed / 5))
-
-            elif self.drift_count - s['count'] > 2:
-                s['time'] = now
-
-        for s in dead_drift_sprites:
-            self.drift_sprites.remove(s)
-
-    def draw(self, surface: pygame.Surface):
-        for s in self.drift_sprites:
-            surface.blit(s['sprite'], s['dest'])
-        surface.blit(self.image, self.rect.topleft)
-
-    def draw_debug(self, surface, target):
-        wx, wy, _ = self.cast_ray()
-        pygame.draw.line(surface, (0, 0, 255), self.rect.center, (wx, wy))
-        pygame.draw.line(surface, (0, 255, 0), self.rect.center, target.rect.center)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, width=1)
+    def draw(self, surface: pygame.Surface, interpolation=1):
+        rects = self.skid_marks.draw(surface)
+
+        if interpolation >= 1:
+            rects.append(surface.blit(self.image, self.image.get_rect(center=(self.x, self.y)).topleft))
+            return rects
+
+        # Entre o estado anterior e o atual, com o angulo pelo menor caminho
+        x0, y0, angle0 = self.previous_state
+        turn = (self.angle + self.drift_factor - angle0 + 180) % 360 - 180
+        image = self.car_rotations.get(angle0 + turn * interpolation)
+        center = (x0 + (self.x - x0) * interpolation, y0 + (self.y - y0) * interpolation)
+        rects.append(surface.blit(image, image.get_rect(center=center).topleft))
+        return rects
+
+    def draw_debug(self, surface, target, wall_point=None):
+        wx, wy = wall_point if wall_point is not None else self.cast_ray()[:2]
+        return [
+            pygame.draw.line(surface, (0, 0, 255), self.rect.center, (wx, wy)),
+            pygame.draw.line(surface, (0, 255, 0), self.rect.center, target.rect.center),
+            pygame.draw.rect(surface, (255, 255, 255), self.rect, width=1)
+        ]
 
     def update_boundaries(self, width, height):
         self.WIDTH = width
         self.HEIGHT = height
 
+    def touching_wall(self):
+        if self.obstacles and self.obstacles.collides(self.rect.inflate(2, 2)):
+            return True
+        return self.rect.left <= 0 or self.rect.top <= 0 or self.rect.right >= self.WIDTH or self.rect.bottom >= self.HEIGHT
+
+NPY_HEADER_SIZE = 128
+
+class FrameTimer:
+    # Tempo gasto em cada fase do frame, guardado em um buffer circular de tamanho fixo (um frame por linha).
+    # Cada lap atribui a fase o tempo desde o lap anterior
+    PHASES = ('control', 'events', 'update', 'draw', 'flip', 'wait')
+
+    def __init__(self, size=600, export_path=None, summary_interval=30):
+        self.size = size
+        self.samples = np.zeros((size, len(self.PHASES)))
+        self.current = [0.0] * len(self.PHASES)
+        self.index = 0
+        self.count = 0
+        self.last = time.perf_counter()
+        self.phase_index = {phase: i for i, phase in enumerate(self.PHASES)}
+
+        self.summary_interval = summary_interval
+        self.summary_lines = []
+
+        self.export_path = export_path
+        self.export_file = None
+        self.exported_rows = 0
+        if export_path and export_path.endswith('.csv'):
+            os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+            self.export_file = open(export_path, 'w')
+            self.export_file.write('frame,' + ','.join(self.PHASES) + '\n')
+        elif export_path:
+            # .npy gravado aos poucos: cada volta completa do buffer e anexada ao arquivo e o numero de linhas no
+            # cabecalho e reescrito (como no TraceRecorder), entao um jogo interrompido nao perde os tempos ja gravados
+            if not export_path.endswith('.npy'):
+                self.export_path = export_path = export_path + '.npy'
+            os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+            self.export_file = open(export_path, 'w+b')
+            self._write_npy_header()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        row = self.index % self.size
+        self.samples[row] = self.current
+
+        if self.export_file and self.export_path.endswith('.csv'):
+            self.export_file.write(f'{self.index},' + ','.join(f'{t:.7f}' for t in self.current) + '\n')
+        elif self.export_file and row == self.size - 1:
+            self._append_npy(self.samples)
+
+        self.index += 1
+        self.count = min(self.count + 1, self.size)
+        self.current = [0.0] * len(self.PHASES)
+
+    def percentiles(self, q=(50, 95, 99)):
+        # Percentis de cada fase nos ultimos frames, em segundos: uma linha por percentil
+        return np.percentile(self.samples[:self.count], q, axis=0)
+
+    def summary(self):
+        # Linhas para o overlay de debug, recalculadas a cada summary_interval frames para o texto ficar legivel
+        if self.count and (not self.summary_lines or self.index % self.summary_interval == 0):
+            p50, p95, p99 = self.percentiles() * 1000
+            self.summary_lines = [
+                f'{phase}: p50 {p50[i]:.2f} p95 {p95[i]:.2f} p99 {p99[i]:.2f} ms'
+                for i, phase in enumerate(self.PHASES)
+            ]
+        return self.summary_lines
+
+    def _write_npy_header(self):
+        # Cabecalho .npy (versao 1.0) de tamanho fixo, para poder ser reescrito com o novo numero de linhas
+        header = repr({'descr': '<f8', 'fortran_order': False, 'shape': (self.exported_rows, len(self.PHASES))})
+        self.export_file.seek(0)
+        self.export_file.write(b'\x93NUMPY\x01\x00' + (NPY_HEADER_SIZE - 10).to_bytes(2, 'little'))
+        self.export_file.write(header.encode('latin1').ljust(NPY_HEADER_SIZE - 11) + b'\n')
+
+    def _append_npy(self, rows):
+        self.export_file.seek(0, os.SEEK_END)
+        self.export_file.write(np.ascontiguousarray(rows, dtype='<f8').tobytes())
+        self.exported_rows += len(rows)
+        self._write_npy_header()
+        self.export_file.flush()
+
+    def close(self):
+        if self.export_file:
+            if not self.export_path.endswith('.csv'):
+                # Linhas da volta incompleta do buffer
+                self._append_npy(self.samples[:self.index % self.size])
+            self.export_file.close()
+            self.export_file = None
+            self.export_path = None
+
+class TextCache:
+    # Superficies de texto renderizadas, indexadas por (texto, fonte, cor), com descarte das menos usadas
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+
+    def _get(self, key, render):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = render()
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def render(self, font, text, color):
+        return self._get((text, font, tuple(color)), lambda: font.render(text, True, color))
+
+    def render_lines(self, font, texts, color, line_spacing=5):
+        return self._get((tuple(texts), font, tuple(color), line_spacing), lambda: self._compose(font, texts, color, line_spacing))
+
+    def _compose(self, font, texts, color, line_spacing):
+        lines = [self.render(font, text, color) for text in texts]
+        width = max((line.get_width() for line in lines), default=0)
+        height = sum(line.get_height() + line_spacing for line in lines)
+
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        y = 0
+        for line in lines:
+            # As linhas nao se sobrepoem; BLEND_RGBA_MAX sobre a superficie zerada copia os pixels sem misturar o alpha
+            surface.blit(line, (0, y), special_flags=pygame.BLEND_RGBA_MAX)
+            y += line.get_height() + line_spacing
+        return surface
+
+class Assets:
+    # Sprites carregados uma unica vez por processo, ja convertidos para o formato da tela e compartilhados entre
+    # todas as instancias (varios Players, Targets, Fleet). Por isso as superficies devolvidas nao devem ser alteradas
+    def __init__(self, folder='sprites'):
+        self.folder = folder
+        self.images = {}
+        self.converted = set()
+        self.rotation_caches = {}
+        self.background_size = None
+        self.background_surface = None
+
+    def _convert(self, surface, alpha):
+        # convert/convert_alpha precisam de uma janela aberta; sem ela (modo headless) o formato original e mantido
+        if not pygame.display.get_surface():
+            return surface, False
+        return (surface.convert_alpha() if alpha else surface.convert()), True
+
+    def image(self, name, size=None):
+        key = (name, size)
+        if key not in self.images:
+            surface = pygame.image.load(os.path.join(self.folder, name))
+            if size is not None:
+                surface = pygame.transform.scale(surface, size)
+            self.images[key] = surface
+
+        # Imagens carregadas antes da janela abrir sao convertidas no primeiro uso com a janela aberta
+        if key not in self.converted:
+            surface = self.images[key]
+            self.images[key], converted = self._convert(surface, surface.get_flags() & pygame.SRCALPHA)
+            if converted:
+                self.converted.add(key)
+
+        return self.images[key]
+
+    def rotations(self, name, size=None, step=1, exact=False, prerender=True):
+        key = (name, size, step, exact)
+        if key not in self.rotation_caches:
+            self.rotation_caches[key] = RotationCache(self.image(name, size), step, exact, prerender)
+        elif prerender:
+            self.rotation_caches[key].prerender()
+        return self.rotation_caches[key]
+
+    def background(self, width, height):
+        # Piso repetido em mosaico ate cobrir a janela, centralizado como o recorte original (quando a janela e
+        # menor que a imagem o resultado e o mesmo recorte do centro). Refeito so quando o tamanho muda
+        if self.background_size == (width, height) and self.background_surface is not None:
+            return self.background_surface
+
+        tile = self.image('floor.jpg')
+        tile_width, tile_height = tile.get_size()
+
+        surface = pygame.Surface((width, height))
+        if pygame.display.get_surface():
+            surface = surface.convert()
+
+        # Deslocamento do primeiro ladrilho para que o centro da imagem coincida com o centro da janela
+        start_x = -((tile_width - width) // 2) % tile_width - tile_width
+        start_y = -((tile_height - height) // 2) % tile_height - tile_height
+        for x in range(start_x, width, tile_width):
+            for y in range(start_y, height, tile_height):
+                surface.blit(tile, (x, y))
+
+        self.background_size = (width, height)
+        self.background_surface = surface
+        return surface
+
+def rotated_size(width, height, angle):
+    # Tamanho da superficie gerada por pygame.transform.rotate(sprite, angle), sem rotacionar (mesma conta do pygame)
+    if angle % 90 == 0:
+        return (height, width) if angle % 180 else (width, height)
+
+    radians = math.radians(angle)
+    cx, cy = math.cos(radians) * width, math.cos(radians) * height
+    sx, sy = math.sin(radians) * width, math.sin(radians) * height
+    return (
+        int(max(abs(cx + sy), abs(cx - sy), abs(-cx + sy), abs(-cx - sy))),
+        int(max(abs(sx + cy), abs(sx - cy), abs(-sx + cy), abs(-sx - cy)))
+    )
+
+class RotationCache:
+    # Versoes de um sprite pre-rotacionadas em passos fixos de angulo (step graus), consultadas no lugar de
+    # pygame.transform.rotate a cada frame. Com exact=True rotaciona no angulo exato, como antes
+    def __init__(self, sprite, step=1, exact=False, prerender=True):
+        self.sprite = sprite
+        self.step = step
+        self.exact = exact
+        self.size = round(360 / step)
+        self.rotations = [None] * self.size
+
+        if prerender:
+            self.prerender()
+
+    def prerender(self):
+        if self.exact:
+            return
+
+        for i in range(self.size):
+            if self.rotations[i] is None:
+                self.rotations[i] = self._render(i)
+
+    def _render(self, index):
+        rotated = pygame.transform.rotate(self.sprite, -index * self.step)
+        # convert_alpha precisa de uma janela aberta; sem ela (modo headless) o formato original e mantido
+        return rotated.convert_alpha() if pygame.display.get_surface() else rotated
+
+    def get(self, angle):
+        if self.exact:
+            return pygame.transform.rotate(self.sprite, -angle)
+
+        index = round(angle / self.step) % self.size
+        if self.rotations[index] is None:
+            self.rotations[index] = self._render(index)
+        return self.rotations[index]
+
+    def memory_bytes(self):
+        return sum(r.get_width() * r.get_height() * r.get_bytesize() for r in self.rotations if r is not None)
+
+assets = Assets()
+
+class SkidMarks:
+    # Marcas de pneu em um buffer circular de capacidade fixa: quando cheio, a marca mais antiga e sobrescrita.
+    # O estado de cada marca fica em arrays, entao liberar, esmaecer e remover marcas e feito em lote
+    def __init__(self, capacity=600, hold_time=1, fade_time=5):
+        self.capacity = capacity
+        self.hold_time = hold_time
+        self.fade_time = fade_time
+
+        self.sprites = [None] * capacity
+        self.dest = np.zeros((capacity, 2), dtype=np.int32)
+        self.count = np.zeros(capacity, dtype=np.int32)
+        self.released_at = np.full(capacity, np.nan) # NaN enquanto o drift que criou a marca estiver ativo
+        self.alpha = np.full(capacity, 255, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.head = 0
+
+    def add(self, sprite, dest, drift_count):
+        i = self.head
+        self.sprites[i] = sprite
+        self.dest[i] = dest
+        self.count[i] = drift_count
+        self.released_at[i] = np.nan
+        self.alpha[i] = 255
+        self.alive[i] = True
+        self.head = (i + 1) % self.capacity
+
+    def release_all(self, now):
+        self.released_at[self.alive & np.isnan(self.released_at)] = now
+
+    def update(self, now, drift_count):
+        if not self.alive.any():
+            return
+
+        # Marcas de drifts com mais de 2 drifts de diferenca comecam a contar o tempo para sumir
+        self.released_at[self.alive & np.isnan(self.released_at) & (drift_count - self.count > 2)] = now
+
+        elapsed = now - self.released_at
+        with np.errstate(invalid='ignore'):
+            dead = self.alive & (elapsed > self.fade_time)
+            fading = self.alive & ~dead & (elapsed > self.hold_time)
+
+        for i in np.flatnonzero(dead):
+            self.sprites[i] = None
+        self.alive[dead] = False
+
+        self.alpha[fading] = 255 * (1 - elapsed[fading] / self.fade_time)
+
+    def draw(self, surface):
+        # Da mais antiga para a mais nova, como na ordem em que foram criadas. Os sprites podem ser compartilhados
+        # (RotationCache), entao o alpha de cada marca e aplicado no momento do blit
+        rects = []
+        order = np.roll(np.arange(self.capacity), -self.head)
+        for i in order[self.alive[order]]:
+            sprite = self.sprites[i]
+            sprite.set_alpha(self.alpha[i])
+            rects.append(surface.blit(sprite, self.dest[i]))
+        return rects
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
 class Target:
-    def __init__(self, width, height, margin=100):
-        self.image = pygame.image.load("sprites/target.png")
-        self.image = pygame.transform.scale(self.image, (20, 20))
+    def __init__(self, width, height, margin=100, get_time=time.time, rng=random, positions=None):
+        self.get_time = get_time
+        self.rng = rng
+
+        # Com positions (alvos de uma pista) o alvo percorre essas posicoes em ordem, em vez de sortear
+        self.positions = positions or None
+        self.position_index = -1
+
+        # Mesmo papel do Player.time_scale, para o modo 'moving'
+        self.time_scale = 1
+
+        self.image = assets.image('target.png', (20, 20))
         self.rect = self.image.get_rect()
         
         self.MARGIN = margin
@@ -318,47 +923,71 @@ class Target:
         self.LEFT_BOUND = self.MARGIN
         self.TOP_BOUND = self.MARGIN
 
-        self.x_speed = random.uniform(-10, 10)
-        self.y_speed = random.uniform(-10, 10)
+        self.x_speed = self.rng.uniform(-10, 10)
+        self.y_speed = self.rng.uniform(-10, 10)
         
         self.move_to_random_position()
-        self.last_direction_change = time.time()
+        self.last_direction_change = self.get_time()
+
+        # Posicao em float do canto do rect, como Player.x/y, usada no modo 'moving' com time_scale diferente de 1:
+        # o passo menor seria arredondado a cada tick se somado direto ao rect
+        self.x, self.y = self.rect.topleft
 
         self.modes = ['static', 'moving', 'mouse']
         self.mode = 'static'
+        self.reached = 0
 
     def move_to_random_position(self):
-        self.rect.x = random.randint(self.LEFT_BOUND, self.LEFT_BOUND + self.WIDTH - self.rect.width)
-        self.rect.y = random.randint(self.TOP_BOUND, self.TOP_BOUND + self.HEIGHT - self.rect.height)
+        if self.positions:
+            self.position_index = (self.position_index + 1) % len(self.positions)
+            self.set_position(*self.positions[self.position_index])
+            return
+
+        self.rect.x = self.rng.randint(self.LEFT_BOUND, self.LEFT_BOUND + self.WIDTH - self.rect.width)
+        self.rect.y = self.rng.randint(self.TOP_BOUND, self.TOP_BOUND + self.HEIGHT - self.rect.height)
 
     def move(self, max_speed=7):
-        self.rect.x += self.x_speed
-        self.rect.y += self.y_speed
+        if self.time_scale == 1:
+            # Passo padrao (60 Hz): o rect e arredondado a cada passo, como sempre foi
+            self.rect.x += self.x_speed
+            self.rect.y += self.y_speed
+        else:
+            # O rect pode ter sido reposicionado de fora (novo alvo, mouse, replay); nesse caso a posicao parte dele
+            if self.rect.topleft != (round(self.x), round(self.y)):
+                self.x, self.y = self.rect.topleft
+
+            self.x += self.x_speed * self.time_scale
+            self.y += self.y_speed * self.time_scale
+            self.rect.topleft = (round(self.x), round(self.y))
 
-        if time.time() - self.last_direction_change > random.uniform(0.3, 1):
-            self.x_speed = random.uniform(-max_speed, max_speed)
-            self.y_speed = random.uniform(-max_speed, max_speed)
-            self.last_direction_change = time.time()
+        if self.get_time() - self.last_direction_change > self.rng.uniform(0.3, 1):
+            self.x_speed = self.rng.uniform(-max_speed, max_speed)
+            self.y_speed = self.rng.uniform(-max_speed, max_speed)
+            self.last_direction_change = self.get_time()
 
         if self.rect.left < self.LEFT_BOUND or self.rect.right > self.LEFT_BOUND + self.WIDTH:
             self.rect.x = min(self.LEFT_BOUND + self.WIDTH, max(self.rect.x, self.LEFT_BOUND))
+            self.x = self.rect.x
             self.x_speed = -self.x_speed
 
         if self.rect.top < self.TOP_BOUND or self.rect.bottom > self.TOP_BOUND + self.HEIGHT:
             self.rect.y = min(self.TOP_BOUND + self.HEIGHT, max(self.rect.y, self.TOP_BOUND))
+            self.y = self.rect.y
             self.y_speed = -self.y_speed
 
     def set_position(self, x, y):
         self.rect.center = (x, y)
 
     def cycle_mode(self):
-        index = self.modes.index(self.mode)
+        # Modos fora da lista (ex.: 'replay', em que o alvo e posicionado de fora) voltam para o primeiro
+        index = self.modes.index(self.mode) if self.mode in self.modes else -1
         next_mode = (index + 1) % 3
         self.mode = self.modes[next_mode]
 
     def update(self, player):
         if self.mode == 'static':
             if player.rect.colliderect(self.rect):
+                self.reached += 1
                 self.move_to_random_position()
 
         elif self.mode == 'moving':
@@ -369,11 +998,13 @@ class Target:
             self.set_position(mouse_x, mouse_y)
 
     def draw(self, surface):
-        surface.blit(self.image, self.rect.topleft)
+        return [surface.blit(self.image, self.rect.topleft)]
 
     def draw_debug(self, surface):
-        pygame.draw.rect(surface, (255, 0, 0), (self.LEFT_BOUND, self.TOP_BOUND, self.WIDTH, self.HEIGHT), width=2)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, width=1)
+        return [
+            pygame.draw.rect(surface, (255, 0, 0), (self.LEFT_BOUND, self.TOP_BOUND, self.WIDTH, self.HEIGHT), width=2),
+            pygame.draw.rect(surface, (255, 255, 255), self.rect, width=1)
+        ]
 
     def update_boundaries(self, width, height, margin=None):
         if margin is not None:
@@ -389,4 +1020,135 @@ class Target:
             self.HEIGHT = max(self.HEIGHT, self.rect.height)
         
         self.LEFT_BOUND = max(0, self.MARGIN)
-        self.TOP_BOUND = max(0, self.MARGIN)
\ No newline at end of file
+        self.TOP_BOUND = max(0, self.MARGIN)
+
+class Fleet:
+    # Varios carros guardados como arrays (struct-of-arrays) e atualizados de uma vez, com a mesma fisica do Player.
+    # Cada carro tem o seu proprio alvo, sempre no modo 'static'
+    def __init__(self, count, width=1000, height=600, margin=100, seed=None, drift_mode=True):
+        self.count = count
+        self.WIDTH = width
+        self.HEIGHT = height
+        self.rng = np.random.default_rng(seed)
+
+        self.x = np.full(count, width // 2, dtype=np.float64)
+        self.y = np.full(count, height // 2, dtype=np.float64)
+        self.angle = np.zeros(count)
+        self.speed = np.zeros(count)
+        self.min_speed = 5
+        self.max_speed = 20
+        self.car_size = (49, 25)
+        self.custom_rotations = None
+
+        self.drift_mode = drift_mode
+        self.braked_hard = np.zeros(count, dtype=bool)
+        self.drift_direction = np.zeros(count, dtype=int) # -1 esquerda, 1 direita, 0 nenhuma
+        self.drift_factor = np.zeros(count)
+        self.target_drift_factor = np.zeros(count)
+        self.drift_count = np.zeros(count, dtype=int)
+
+        self.target_size = 20
+        self.target_margin = margin
+        self.target_x = np.zeros(count, dtype=int)
+        self.target_y = np.zeros(count, dtype=int)
+        self.targets_reached = np.zeros(count, dtype=int)
+        self.move_targets(np.ones(count, dtype=bool))
+
+    def move_targets(self, mask):
+        # Mesmo sorteio de Target.move_to_random_position, para os alvos selecionados
+        n = np.count_nonzero(mask)
+        right = self.WIDTH - self.target_margin - self.target_size
+        bottom = self.HEIGHT - self.target_margin - self.target_size
+        self.target_x[mask] = self.rng.integers(self.target_margin, max(self.target_margin, right) + 1, n)
+        self.target_y[mask] = self.rng.integers(self.target_margin, max(self.target_margin, bottom) + 1, n)
+
+    def get_distance_to_wall(self):
+        radians = np.radians(self.angle)
+        dx, dy = np.cos(radians), np.sin(radians)
+
+        with np.errstate(divide='ignore'):
+            distance_x = np.where(dx > 0, (self.WIDTH - self.x) / dx, np.where(dx < 0, -self.x / dx, np.inf))
+            distance_y = np.where(dy > 0, (self.HEIGHT - self.y) / dy, np.where(dy < 0, -self.y / dy, np.inf))
+
+        inside = (0 < self.x) & (self.x < self.WIDTH) & (0 < self.y) & (self.y < self.HEIGHT)
+        return np.where(inside, np.minimum(distance_x, distance_y), 0)
+
+    def get_angle_to_target(self):
+        dx = self.target_x + self.target_size // 2 - self.x
+        dy = self.target_y + self.target_size // 2 - self.y
+        target_angle = np.degrees(np.arctan2(dy, dx)) % 360
+        angle_difference = (target_angle - self.angle + 360) % 360
+        return np.where(angle_difference > 180, angle_difference - 360, angle_difference)
+
+    def rotate(self, directions):
+        # directions: -1 esquerda, 1 direita, 0 nao vira
+        directions = np.asarray(directions)
+        turning = directions != 0
+        amount = 5 * (1 - (self.speed - self.min_speed) / self.max_speed) ** 2 * directions
+
+        if self.drift_mode:
+            starts = turning & self.braked_hard & (np.abs(amount) > 3)
+            stops = turning & ~starts & (np.abs(amount) < 4.75)
+
+            self.target_drift_factor[starts] = amount[starts] * 10
+            self.drift_direction[starts] = directions[starts]
+            self.drift_count[starts] += 1
+            self.target_drift_factor[stops] = 0
+            self.target_drift_factor[turning & (self.drift_direction != directions)] = 0
+        else:
+            self.target_drift_factor[turning] = 0
+
+        self.angle = np.where(turning, (self.angle + amount) % 360, self.angle)
+
+    def change_speed_by(self, amounts):
+        amounts = np.asarray(amounts)
+        self.braked_hard = amounts < -0.7
+        self.speed = np.clip(self.speed + amounts, self.min_speed, self.max_speed)
+
+    def update(self):
+        radians = np.radians(-self.angle)
+        self.x += np.cos(radians) * self.speed
+        self.y -= np.sin(radians) * self.speed
+
+        self.target_drift_factor[self.speed > 7.5] = 0
+        # Como o if/elif do Player: uma unica mudanca por tick, decidida pelo valor anterior
+        self.drift_factor += np.where(self.target_drift_factor < self.drift_factor, -2,
+                                      np.where(self.target_drift_factor > self.drift_factor, 2, 0))
+
+        # Caixa do sprite rotacionado, como o rect do Player (aproximado em ate 1px do tamanho gerado pelo pygame)
+        radians = np.radians(self.angle + self.drift_factor)
+        cos, sin = np.abs(np.cos(radians)), np.abs(np.sin(radians))
+        half_width = (self.car_size[0] * cos + self.car_size[1] * sin) / 2
+        half_height = (self.car_size[0] * sin + self.car_size[1] * cos) / 2
+
+        reached = (
+            (self.x - half_width < self.target_x + self.target_size) & (self.target_x < self.x + half_width) &
+            (self.y - half_height < self.target_y + self.target_size) & (self.target_y < self.y + half_height)
+        )
+        self.targets_reached += reached
+        self.move_targets(reached)
+
+    def step(self, controller):
+        # Um tick de todos os carros, com uma unica inferencia em lote do controlador
+        outputs = controller.computar_batch(self.get_angle_to_target(), self.get_distance_to_wall())
+        self.rotate(outputs['virar'])
+        self.change_speed_by(outputs['velocidade'])
+        self.update()
+        return outputs
+
+    def draw(self, surface, car_image=None, target_image=None):
+        # Renderizacao opcional: desenha todos os carros e alvos sobre a superficie
+        if car_image is None:
+            car_rotations = assets.rotations('car.png', self.car_size)
+        else:
+            # Rotacoes de uma imagem propria: guardadas entre chamadas e geradas so nos angulos usados
+            if self.custom_rotations is None or self.custom_rotations.sprite is not car_image:
+                self.custom_rotations = RotationCache(car_image, prerender=False)
+            car_rotations = self.custom_rotations
+        if target_image is None:
+            target_image = assets.image('target.png', (self.target_size, self.target_size))
+
+        for i in range(self.count):
+            surface.blit(target_image, (self.target_x[i], self.target_y[i]))
+            image = car_rotations.get(self.angle[i] + self.drift_factor[i])
+            surface.blit(image, image.get_rect(center=(self.x[i], self.y[i])).topleft)
@@ -1,20 +1,89 @@
+import argparse
+
 from fuzzy import FuzzyController
 from game import GameLoop
+from recording import TracePlayer, TraceRecorder, load_trace, trace_metadata
+from scheduling import ControllerRunner
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--gravar', metavar='ARQUIVO', help='grava as entradas, saidas e o estado de cada tick em um trace')
+parser.add_argument('--replay', metavar='ARQUIVO', help='reproduz as acoes de um trace sem rodar o controlador')
+parser.add_argument('--taxa-controle', type=float, metavar='HZ', help='roda o controlador em paralelo ao jogo, nesta taxa')
+parser.add_argument('--processo', action='store_true', help='com --taxa-controle, usa um processo em vez de uma thread')
+parser.add_argument('--pista', metavar='ARQUIVO', help='pista com obstaculos e alvos (ex.: tracks/circuito.json)')
+parser.add_argument('--fisica', type=float, metavar='HZ', help='roda a fisica e o controlador nesta taxa fixa, independente do fps')
+parser.add_argument('--inferencia', choices=['mamdani', 'sugeno'], default='mamdani')
+parser.add_argument('--capturar', metavar='CAMINHO', help='grava os frames em uma pasta de PNGs, ou em video bruto se terminar em .rgb')
+parser.add_argument('--capturar-cada', type=int, default=1, metavar='N', help='com --capturar, grava um a cada N frames')
+args = parser.parse_args()
+
+if args.gravar and args.taxa_controle:
+    # Com o controlador em paralelo as acoes nao passam pelo laco abaixo e o trace ficaria vazio
+    parser.error('--gravar nao pode ser usado com --taxa-controle')
+
+taxa_fisica = args.fisica
+reprodutor = None
+if args.replay:
+    # O replay usa a taxa de fisica da gravacao, com um registro por passo (ou por tick, sem --fisica)
+    reprodutor = TracePlayer(load_trace(args.replay))
+    taxa_fisica = trace_metadata(args.replay).get('physics_rate')
+
+game = GameLoop(track=args.pista, physics_rate=taxa_fisica, capture=args.capturar, capture_every=args.capturar_cada);
+controle = FuzzyController(pasta_cache='output/cache', inferencia=args.inferencia)
+
+gravador = TraceRecorder(args.gravar, physics_rate=taxa_fisica) if args.gravar else None
 
-game = GameLoop();
-controle = FuzzyController()
+controle_assincrono = None
+if args.taxa_controle and not reprodutor:
+    controle_assincrono = ControllerRunner(controle, args.taxa_controle, 'process' if args.processo else 'thread').start()
+    game.controller = controle_assincrono
+elif reprodutor and taxa_fisica:
+    game.controller = reprodutor
+
+def controlar(observacao):
+    # Um passo do controlador: usado direto no laco abaixo ou, com --fisica, a cada passo de fisica
+    saidas = controle.computar(observacao.angle_to_target, observacao.distance_to_wall)
+    if gravador:
+        gravador.record(game, observacao.angle_to_target, observacao.distance_to_wall, saidas)
+    return saidas
+
+if taxa_fisica and not reprodutor and not game.controller:
+    game.policy = controlar
 
 while game.is_running():
-    distancia_parede = game.get_distance_to_wall()
-    angulo = game.get_angle_to_target()
+    if reprodutor:
+        if taxa_fisica:
+            # Os registros sao aplicados pelo GameLoop, um por passo de fisica
+            game.tick()
+        else:
+            reprodutor.step(game)
+        continue
+
+    if game.controller or game.policy:
+        # As acoes sao aplicadas pelo proprio GameLoop; aqui so fica o pedido de relatorio
+        if game.requested_snapshot():
+            controle.computar(game.get_angle_to_target(), game.get_distance_to_wall(), gerar_relatorio=True)
+        game.tick()
+        continue
+
+    observacao = game.observe()
+    distancia_parede = observacao.distance_to_wall
+    angulo = observacao.angle_to_target
 
     saidas = controle.computar(angulo, distancia_parede, gerar_relatorio=game.requested_snapshot())
 
-    if saidas['virar'] > 0:
-        game.rotate('right')
-    elif saidas['virar'] < 0:
-        game.rotate('left')
+    if gravador:
+        gravador.record(game, angulo, distancia_parede, saidas)
+
+    game.step(saidas)
 
-    game.apply_speed_change(saidas['velocidade'])
+if gravador:
+    gravador.close()
+if controle_assincrono:
+    controle_assincrono.stop()
+    print(f'[INFO] Controle assincrono: {controle_assincrono.stats()}')
+if reprodutor:
+    print(f'[INFO] Replay: {reprodutor.index} ticks, {reprodutor.divergences} divergencias')
 
-    game.tick()
\ No newline at end of file
+game.close()
+controle.encerrar_relatorios()
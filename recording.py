@@ -0,0 +1,238 @@
+import argparse
+import ast
+import os
+
+import numpy as np
+
+# Gravacao de cada tick (entradas do controlador, saidas do computar e estado do carro e do alvo) em um arquivo
+# binario de registros de tamanho fixo. As linhas sao escritas em um buffer preallocado e descarregadas no
+# arquivo mapeado em memoria a cada bloco; a leitura usa np.memmap, entao traces grandes abrem sem copia
+
+TRACE_DTYPE = np.dtype([
+    ('tick', '<u4'),
+    ('time', '<f8'),
+    ('angle_to_target', '<f4'),
+    ('distance_to_wall', '<f4'),
+    ('virar', 'i1'),
+    ('velocidade', '<f8'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('angle', '<f4'),
+    ('speed', '<f4'),
+    ('drift_factor', '<f4'),
+    ('target_x', '<i2'),
+    ('target_y', '<i2'),
+    ('flags', 'u1')
+])
+
+FLAG_PAUSED = 1
+FLAG_DRIFT_MODE = 2
+
+# Cabecalho: identificador, numero de registros, a descricao do dtype (para ler traces de versoes anteriores) e
+# os metadados da gravacao. Com fisica em passo fixo (physics_rate), cada registro e um passo de fisica, o campo
+# tick guarda o numero do passo e time_scale e a escala aplicada aos valores por passo do Player e do Target
+MAGIC = b'DRIFTTRC'
+HEADER_SIZE = 512
+
+def write_header(file, count, dtype, metadata=None):
+    descr = repr({'descr': dtype.descr, **(metadata or {})}).encode('ascii')
+    header = MAGIC + int(count).to_bytes(8, 'little') + descr
+    if len(header) > HEADER_SIZE:
+        raise ValueError('Descricao do dtype nao cabe no cabecalho do trace')
+
+    file.seek(0)
+    file.write(header.ljust(HEADER_SIZE, b' '))
+
+def read_header(path):
+    with open(path, 'rb') as file:
+        header = file.read(HEADER_SIZE)
+
+    if header[:8] != MAGIC:
+        raise ValueError(f'{path} nao e um trace')
+
+    count = int.from_bytes(header[8:16], 'little')
+    metadata = ast.literal_eval(header[16:].decode('ascii').strip())
+    if not isinstance(metadata, dict):
+        # Traces antigos so tinham a descricao do dtype
+        metadata = {'descr': metadata}
+
+    dtype = np.dtype(metadata.pop('descr'))
+    return count, dtype, metadata
+
+def trace_metadata(path):
+    return read_header(path)[2]
+
+class TraceRecorder:
+    def __init__(self, path, chunk_size=65536, physics_rate=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.buffer = np.zeros(chunk_size, dtype=TRACE_DTYPE)
+        self.pending = 0
+        self.count = 0
+        self.metadata = {'physics_rate': physics_rate, 'time_scale': 60 / physics_rate if physics_rate else 1}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'w+b')
+        write_header(self.file, 0, TRACE_DTYPE, self.metadata)
+        self.file.flush()
+
+    def record(self, game, angle_to_target, distance_to_wall, outputs):
+        # Chamado antes do game.tick() (ou, com fisica em passo fixo, antes de cada passo): o estado gravado e o que
+        # o controlador viu ao decidir a acao
+        player, target = game.player, game.target
+        flags = (FLAG_PAUSED if game.paused else 0) | (FLAG_DRIFT_MODE if player.drift_mode else 0)
+        tick = game.physics_steps if game.physics_rate else game.tick_count
+
+        self.buffer[self.pending] = (
+            tick, game.now(), angle_to_target, distance_to_wall, outputs['virar'], outputs['velocidade'],
+            player.x, player.y, player.angle, player.speed, player.drift_factor, target.rect.x, target.rect.y, flags
+        )
+        self.pending += 1
+
+        if self.pending == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        # Aumenta o arquivo, mapeia so o trecho novo e copia o bloco do buffer para ele
+        offset = HEADER_SIZE + self.count * TRACE_DTYPE.itemsize
+        self.file.truncate(offset + self.pending * TRACE_DTYPE.itemsize)
+        chunk = np.memmap(self.file, dtype=TRACE_DTYPE, mode='r+', offset=offset, shape=(self.pending,))
+        chunk[:] = self.buffer[:self.pending]
+        chunk.flush()
+        del chunk
+
+        # O contador no cabecalho so e atualizado depois dos dados, entao um trace interrompido continua legivel
+        self.count += self.pending
+        self.pending = 0
+        write_header(self.file, self.count, TRACE_DTYPE, self.metadata)
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+def load_trace(path):
+    # Registros mapeados direto do arquivo (somente leitura), sem copiar para a memoria
+    count, dtype, _ = read_header(path)
+    if not count:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+def first_divergence(a, b, fields=('virar', 'velocidade'), tolerance=1e-6):
+    # Primeiro indice em que dois traces diferem nos campos dados, ou None
+    n = min(len(a), len(b))
+    different = np.zeros(n, dtype=bool)
+    for field in fields:
+        different |= ~np.isclose(a[field][:n], b[field][:n], rtol=0, atol=tolerance)
+
+    indices = np.flatnonzero(different)
+    if len(indices):
+        return int(indices[0])
+    return None if len(a) == len(b) else n
+
+def summarize(trace):
+    active = trace[(trace['flags'] & FLAG_PAUSED) == 0]
+    if not len(active):
+        return {'ticks': len(trace), 'active_ticks': 0}
+
+    # O alvo so muda de lugar (no modo static) quando e alcancado
+    target_moves = np.count_nonzero((np.diff(active['target_x']) != 0) | (np.diff(active['target_y']) != 0))
+    return {
+        'ticks': len(trace),
+        'active_ticks': len(active),
+        'target_moves': int(target_moves),
+        'mean_speed': float(active['speed'].mean()),
+        'mean_distance_to_wall': float(active['distance_to_wall'].mean()),
+        'turn_left': float(np.mean(active['virar'] < 0)),
+        'turn_right': float(np.mean(active['virar'] > 0)),
+        'drifting': float(np.mean(active['drift_factor'] != 0))
+    }
+
+class TracePlayer:
+    # Conduz o jogo com as acoes gravadas, sem rodar o controlador fuzzy. O alvo e reposicionado a partir do
+    # trace a cada tick e o estado do carro e comparado com o gravado para detectar divergencias
+    def __init__(self, trace, tolerance=1e-3):
+        self.trace = trace
+        self.tolerance = tolerance
+        self.index = 0
+        self.divergences = 0
+        self.first_divergence = None
+
+    def done(self):
+        return self.index >= len(self.trace)
+
+    def step(self, game):
+        self.apply(game)
+        game.tick()
+
+    def apply(self, game):
+        # Aplica o proximo registro sem avancar o jogo. Traces gravados com fisica em passo fixo tem um registro por
+        # passo, e um frame com janela pode ter varios passos: nesse caso o TracePlayer e o game.controller e o
+        # GameLoop chama apply antes de cada passo. Ticks gravados com o jogo pausado nao mudam nada e sao pulados
+        while not self.done() and self.trace[self.index]['flags'] & FLAG_PAUSED:
+            self.index += 1
+
+        if self.done() or game.paused:
+            return
+
+        row = self.trace[self.index]
+        player = game.player
+
+        state = np.array([player.x, player.y, player.angle, player.speed], dtype=np.float32)
+        expected = np.array([row['x'], row['y'], row['angle'], row['speed']], dtype=np.float32)
+        if not np.allclose(state, expected, rtol=0, atol=self.tolerance):
+            self.divergences += 1
+            if self.first_divergence is None:
+                self.first_divergence = self.index
+
+        # Modo fora do ciclo do Target: o alvo fica parado onde o trace mandar
+        game.target.mode = 'replay'
+        game.target.rect.topleft = (int(row['target_x']), int(row['target_y']))
+        player.drift_mode = bool(row['flags'] & FLAG_DRIFT_MODE)
+
+        if row['virar'] > 0:
+            game.rotate('right')
+        elif row['virar'] < 0:
+            game.rotate('left')
+
+        game.apply_speed_change(float(row['velocidade']))
+        self.index += 1
+
+def replay(trace, seed=None, physics_rate=None):
+    # physics_rate e o da gravacao (trace_metadata); no modo headless cada tick e um passo de fisica
+    from game import GameLoop
+
+    game = GameLoop(headless=True, seed=seed, physics_rate=physics_rate)
+    player = TracePlayer(trace)
+    while not player.done():
+        player.step(game)
+
+    return {'ticks': player.index, 'divergences': player.divergences, 'first_divergence': player.first_divergence}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analise e replay de traces gravados com main.py --gravar')
+    parser.add_argument('command', choices=['info', 'compare', 'replay'])
+    parser.add_argument('traces', nargs='+')
+    args = parser.parse_args()
+
+    traces = [load_trace(path) for path in args.traces]
+
+    if args.command == 'info':
+        for path, trace in zip(args.traces, traces):
+            print(path, trace_metadata(path), summarize(trace))
+
+    elif args.command == 'compare':
+        index = first_divergence(traces[0], traces[1])
+        if index is None:
+            print('[INFO] Traces identicos nas saidas do controlador')
+        else:
+            print(f"[INFO] Primeira divergencia no registro {index} (tick {traces[0]['tick'][min(index, len(traces[0]) - 1)]})")
+
+    elif args.command == 'replay':
+        for path, trace in zip(args.traces, traces):
+            print(path, replay(trace, physics_rate=trace_metadata(path).get('physics_rate')))
@@ -0,0 +1,158 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+from scheduling import process_context
+
+# Geracao dos relatorios de snapshot em um processo separado, para nao travar o laco do jogo.
+# O processo recebe uma copia do modelo (universos, pertinencias e motores) e das entradas/saidas de cada
+# snapshot, e reaproveita as mesmas figuras do matplotlib (backend Agg) entre relatorios
+
+ROTULOS = {
+    'fechada_esq': 'Fechada Esq',
+    'media_esq': 'Média Esq',
+    'aberta_esq': 'Aberta Esq',
+    'aberta_dir': 'Aberta Dir',
+    'media_dir': 'Média Dir',
+    'fechada_dir': 'Fechada Dir',
+    'perto': 'Perto',
+    'medio': 'Médio',
+    'longe': 'Longe'
+}
+
+def rotulo(termo):
+    return ROTULOS.get(termo, termo.replace('_', ' ').title())
+
+class FilaRelatorios:
+    def __init__(self, modelo, pasta_base='output/snapshot'):
+        self.modelo = modelo
+        self.pasta_base = pasta_base
+        self.fila = None
+        self.processo = None
+
+    def enviar(self, curva_input, distancia_borda_input, virar_output, velocidade_output):
+        # Cada snapshot vai para uma pasta com data e hora, entao varios pedidos podem ficar na fila sem sobrescrever
+        if self.processo is None:
+            contexto = process_context()
+            self.fila = contexto.Queue()
+            self.processo = contexto.Process(target=_trabalhador, args=(self.modelo, self.fila), daemon=True)
+            self.processo.start()
+
+        pasta = os.path.join(self.pasta_base, datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+        self.fila.put((pasta, float(curva_input), float(distancia_borda_input), float(virar_output), float(velocidade_output)))
+        print(f"[INFO] Relatório enfileirado em {pasta}.")
+        return pasta
+
+    def encerrar(self):
+        # Espera os relatorios pendentes terminarem
+        if self.processo is not None:
+            self.fila.put(None)
+            self.processo.join()
+            self.processo = None
+
+def _trabalhador(modelo, fila):
+    gerador = GeradorRelatorios(modelo)
+    while True:
+        pedido = fila.get()
+        if pedido is None:
+            break
+        gerador.gerar(*pedido)
+
+class GeradorRelatorios:
+    def __init__(self, modelo):
+        from matplotlib.figure import Figure
+
+        self.universos = modelo['universos']
+        self.funcoes_pertinencia = modelo['funcoes_pertinencia']
+        self.pertinencias = modelo['pertinencias']
+        self.motores = modelo['motores']
+
+        # Uma figura por variavel, criada uma unica vez; a cada relatorio so as partes que dependem do snapshot mudam
+        self.figuras = {}
+        for variavel in ('curva', 'distancia_borda', 'virar', 'velocidade'):
+            figura = Figure(figsize=(8, 3))
+            eixo = figura.add_subplot()
+            universo = self.universos[variavel]
+            for termo, mf in zip(self.funcoes_pertinencia[variavel], self.pertinencias[variavel]):
+                eixo.plot(universo, mf, linewidth=1.5, label=termo)
+
+            eixo.set_ylim(-0.01, 1.01)
+            eixo.set_ylabel('Membership')
+            eixo.set_xlabel(variavel)
+            eixo.legend(loc='upper center', bbox_to_anchor=(0.5, -0.25), ncol=len(self.funcoes_pertinencia[variavel]), fontsize='small')
+            figura.subplots_adjust(bottom=0.35)
+
+            marcador = eixo.axvline(universo[0], color='k', linewidth=2)
+            self.figuras[variavel] = {'figura': figura, 'eixo': eixo, 'marcador': marcador, 'area': None}
+
+    def _graus(self, variavel, valor):
+        return [float(np.interp(valor, self.universos[variavel], mf)) for mf in self.pertinencias[variavel]]
+
+    def gerar(self, pasta, curva_input, distancia_borda_input, virar_output, velocidade_output):
+        os.makedirs(pasta, exist_ok=True)
+
+        graus_curva = self._graus('curva', curva_input)
+        graus_distancia = self._graus('distancia_borda', distancia_borda_input)
+        linhas_curva = '\n'.join(
+            f"                {rotulo(termo)}: {grau:.2f}" for termo, grau in zip(self.funcoes_pertinencia['curva'], graus_curva)
+        )
+        linhas_distancia = '\n'.join(
+            f"                {rotulo(termo)}: {grau:.2f}" for termo, grau in zip(self.funcoes_pertinencia['distancia_borda'], graus_distancia)
+        )
+
+        relatorio = f"""
+        Relatório de Controle Fuzzy
+        ===========================
+        Entradas:
+            Curva: {curva_input:.0f}°
+            Distância da borda: {distancia_borda_input:.0f}px
+
+        Saídas:
+            Virar: {virar_output:.2f} (Ação: {'Esquerda' if virar_output < 0 else 'Direita' if virar_output > 0 else 'Manter'})
+            Velocidade: {velocidade_output:.2f}
+
+        Pertinência:
+            Curva:
+{linhas_curva}
+
+            Distância da borda:
+{linhas_distancia}
+
+        """
+
+        with open(os.path.join(pasta, 'relatorio_fuzzy.txt'), 'w') as file:
+            file.write(relatorio)
+
+        self._atualizar_entrada('curva', curva_input, f'Curva = {curva_input:.0f}°')
+        self._atualizar_entrada('distancia_borda', distancia_borda_input, f'Entrada: Distância da borda = {distancia_borda_input:.0f}px')
+        if distancia_borda_input <= 200:
+            self.figuras['distancia_borda']['eixo'].set_xlim(0, 200)
+        else:
+            self.figuras['distancia_borda']['eixo'].set_xlim(0, int(distancia_borda_input) + 100)
+
+        self._atualizar_saida('virar', curva_input, distancia_borda_input, virar_output, f'Saída: Virar = {virar_output:.2f}')
+        self._atualizar_saida('velocidade', curva_input, distancia_borda_input, velocidade_output, f'Saída: Velocidade = {velocidade_output:.2f}')
+
+        for variavel, nome in (('curva', 'curva_fuzzy'), ('distancia_borda', 'distancia_borda_fuzzy'), ('virar', 'virar_fuzzy'), ('velocidade', 'velocidade_fuzzy')):
+            self.figuras[variavel]['figura'].savefig(os.path.join(pasta, f'{nome}.png'))
+
+        print(f"[INFO] Relatório e gráficos gerados em {pasta}.")
+
+    def _atualizar_entrada(self, variavel, valor, titulo):
+        figura = self.figuras[variavel]
+        figura['marcador'].set_xdata([valor, valor])
+        figura['eixo'].set_title(titulo)
+
+    def _atualizar_saida(self, variavel, curva_input, distancia_borda_input, valor, titulo):
+        # Area ativada: cada termo cortado no seu nivel de ativacao, agregados por max
+        figura = self.figuras[variavel]
+        cortes = self.motores[variavel].cortes([curva_input], [distancia_borda_input])[0]
+        agregado = np.max(np.fmin(cortes[:, None], self.pertinencias[variavel]), axis=0)
+
+        if figura['area'] is not None:
+            figura['area'].remove()
+        figura['area'] = figura['eixo'].fill_between(self.universos[variavel], 0, agregado, facecolor='Orange', alpha=0.7)
+
+        figura['marcador'].set_xdata([valor, valor])
+        figura['eixo'].set_title(titulo)
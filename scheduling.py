@@ -0,0 +1,157 @@
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+# Controlador fuzzy rodando em uma thread ou processo proprio, em uma taxa fixa e independente do fps.
+# O jogo publica as leituras dos sensores e o controlador publica as acoes, cada um em uma caixa que guarda
+# apenas o valor mais recente; o GameLoop aplica a ultima acao disponivel a cada tick
+
+def process_context():
+    # fork quando disponivel: com spawn o processo filho reimportaria o script principal, e o main.py (sem guarda
+    # de __main__) abriria o jogo de novo
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+class LatestValueSlot:
+    # Ultimo valor publicado, em memoria compartilhada (serve para threads e processos) e sem lock: um contador
+    # de sequencia fica impar durante a escrita e quem le repete a leitura se ele mudou no meio (seqlock)
+    def __init__(self, size):
+        self.raw = multiprocessing.RawArray('d', size + 1)
+        self.size = size
+        self.view = None
+
+    def _view(self):
+        if self.view is None:
+            self.view = np.frombuffer(self.raw, dtype=np.float64)
+        return self.view
+
+    def __getstate__(self):
+        # A view do numpy seria copiada pelo pickle (spawn); o processo filho cria a sua sobre a memoria compartilhada
+        return {'raw': self.raw, 'size': self.size, 'view': None}
+
+    def publish(self, *values):
+        view = self._view()
+        view[0] += 1
+        view[1:] = values
+        view[0] += 1
+
+    def read(self):
+        # Retorna (numero de publicacoes, valores); antes da primeira publicacao o numero e 0
+        view = self._view()
+        while True:
+            sequence = view[0]
+            if sequence % 2:
+                continue
+            values = view[1:].copy()
+            if view[0] == sequence:
+                return int(sequence) // 2, values
+
+def run_controller(controller, rate, sensors, actions, stop):
+    period = 1 / rate
+    deadline = time.perf_counter() + period
+    computations = 0
+    missed_deadlines = 0
+
+    while not stop.is_set():
+        sequence, (tick, angle, distance) = sensors.read()
+        if sequence:
+            start = time.perf_counter()
+            output = controller.computar(angle, distance)
+            finished = time.perf_counter()
+
+            computations += 1
+            if finished > deadline:
+                missed_deadlines += 1
+            actions.publish(tick, output['virar'], output['velocidade'], computations, missed_deadlines, finished - start)
+
+        now = time.perf_counter()
+        if now < deadline:
+            stop.wait(deadline - now)
+            deadline += period
+        else:
+            # Atrasado: os periodos perdidos nao sao recuperados em rajada
+            deadline = now + period
+
+class ControllerRunner:
+    def __init__(self, controller, rate=30, mode='thread'):
+        self.rate = rate
+        self.mode = mode
+
+        self.sensors = LatestValueSlot(3)
+        self.actions = LatestValueSlot(6)
+
+        if mode == 'thread':
+            self.stop_event = threading.Event()
+            self.worker = threading.Thread(target=run_controller, args=(controller, rate, self.sensors, self.actions, self.stop_event), daemon=True)
+        elif mode == 'process':
+            context = process_context()
+            self.stop_event = context.Event()
+            self.worker = context.Process(target=run_controller, args=(controller, rate, self.sensors, self.actions, self.stop_event), daemon=True)
+        else:
+            raise ValueError(f'Modo de execucao do controlador desconhecido: {mode}')
+
+        self.last_sequence = 0
+        self.applied = 0
+        self.reused = 0
+        self.stale_ticks = 0
+        self.max_stale_ticks = 0
+        self.stale_sum = 0
+        self.last_values = None
+
+    def start(self):
+        self.worker.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.worker.join()
+
+    def apply(self, game):
+        # Chamado pelo GameLoop a cada tick: publica os sensores e aplica a acao mais recente (mantida entre ticks)
+        self.sensors.publish(game.tick_count, game.get_angle_to_target(), game.get_distance_to_wall())
+
+        sequence, values = self.actions.read()
+        if not sequence:
+            return
+        tick, virar, velocidade = values[:3]
+
+        if sequence == self.last_sequence:
+            self.reused += 1
+        self.last_sequence = sequence
+        self.last_values = values
+
+        # Idade da acao: ticks entre a leitura de sensores usada pelo controlador e o tick atual
+        self.stale_ticks = game.tick_count - int(tick)
+        self.max_stale_ticks = max(self.max_stale_ticks, self.stale_ticks)
+        self.stale_sum += self.stale_ticks
+        self.applied += 1
+
+        if virar > 0:
+            game.rotate('right')
+        elif virar < 0:
+            game.rotate('left')
+
+        game.apply_speed_change(float(velocidade))
+
+    def stats(self):
+        computations, missed_deadlines, compute_time = self.last_values[3:] if self.last_values is not None else (0, 0, 0)
+        return {
+            'computations': int(computations),
+            'missed_deadlines': int(missed_deadlines),
+            'compute_time': float(compute_time),
+            'applied': self.applied,
+            'reused': self.reused,
+            'stale_ticks': self.stale_ticks,
+            'max_stale_ticks': self.max_stale_ticks,
+            'mean_stale_ticks': self.stale_sum / self.applied if self.applied else 0
+        }
+
+    def summary(self):
+        # Linhas para o overlay de debug
+        stats = self.stats()
+        return [
+            f"Controle ({self.mode}, {self.rate:g} Hz): {stats['computations']} calculos, {stats['missed_deadlines']} prazos perdidos",
+            f"Atraso da acao: {stats['stale_ticks']} ticks (max {stats['max_stale_ticks']}), ultimo calculo {stats['compute_time'] * 1000:.2f} ms"
+        ]
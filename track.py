@@ -0,0 +1,181 @@
+import json
+import math
+
+import pygame
+
+# Pistas com obstaculos estaticos (retangulos e segmentos) e varios alvos, carregadas de arquivos JSON.
+# Os obstaculos ficam em uma grade uniforme: cada celula guarda os obstaculos que a tocam, entao raios e
+# colisoes so testam os obstaculos das celulas percorridas, e nao todos
+
+class ObstacleGrid:
+    def __init__(self, width, height, cell_size=50):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.columns = max(1, math.ceil(width / cell_size))
+        self.rows = max(1, math.ceil(height / cell_size))
+
+        self.rects = []
+        self.segments = []
+        # (coluna, linha) -> lista de ('rect' | 'segment', indice)
+        self.cells = {}
+
+    def _cell_range(self, left, top, right, bottom):
+        c0 = max(0, int(left // self.cell_size))
+        r0 = max(0, int(top // self.cell_size))
+        c1 = min(self.columns - 1, int(right // self.cell_size))
+        r1 = min(self.rows - 1, int(bottom // self.cell_size))
+        return c0, r0, c1, r1
+
+    def _insert(self, item, left, top, right, bottom):
+        c0, r0, c1, r1 = self._cell_range(left, top, right, bottom)
+        for column in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                self.cells.setdefault((column, row), []).append(item)
+
+    def add_rect(self, x, y, width, height):
+        self.rects.append(pygame.Rect(x, y, width, height))
+        self._insert(('rect', len(self.rects) - 1), x, y, x + width, y + height)
+
+    def add_segment(self, x1, y1, x2, y2):
+        # O segmento entra em todas as celulas da sua caixa envolvente (simples, e os segmentos sao curtos)
+        self.segments.append((x1, y1, x2, y2))
+        self._insert(('segment', len(self.segments) - 1), min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    def __len__(self):
+        return len(self.rects) + len(self.segments)
+
+    def _ray_rect(self, x, y, dx, dy, rect):
+        # Metodo das fatias (slabs): distancia ate a entrada no retangulo, ou None
+        t_min, t_max = 0.0, math.inf
+        for origin, direction, low, high in ((x, dx, rect.left, rect.right), (y, dy, rect.top, rect.bottom)):
+            if direction == 0:
+                if not low <= origin <= high:
+                    return None
+                continue
+
+            t1, t2 = (low - origin) / direction, (high - origin) / direction
+            if t1 > t2:
+                t1, t2 = t2, t1
+            t_min, t_max = max(t_min, t1), min(t_max, t2)
+            if t_min > t_max:
+                return None
+
+        return t_min
+
+    def _ray_segment(self, x, y, dx, dy, segment):
+        x1, y1, x2, y2 = segment
+        sx, sy = x2 - x1, y2 - y1
+        denominator = dx * sy - dy * sx
+        if denominator == 0:
+            return None
+
+        t = ((x1 - x) * sy - (y1 - y) * sx) / denominator
+        u = ((x1 - x) * dy - (y1 - y) * dx) / denominator
+        if t >= 0 and 0 <= u <= 1:
+            return t
+        return None
+
+    def _ray_item(self, x, y, dx, dy, item):
+        kind, index = item
+        if kind == 'rect':
+            return self._ray_rect(x, y, dx, dy, self.rects[index])
+        return self._ray_segment(x, y, dx, dy, self.segments[index])
+
+    def cast_ray(self, x, y, angle, max_distance=math.inf):
+        # Distancia ate o primeiro obstaculo na direcao angle (graus, mesma convencao do Player), limitada a max_distance.
+        # Percorre as celulas da grade na ordem em que o raio as cruza (Amanatides & Woo) e para assim que
+        # a proxima celula comeca depois do obstaculo mais proximo ja encontrado
+        radians = math.radians(angle)
+        dx, dy = math.cos(radians), math.sin(radians)
+
+        column, row = int(x // self.cell_size), int(y // self.cell_size)
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            # Origem fora da grade: testa todos os obstaculos
+            items = [('rect', i) for i in range(len(self.rects))] + [('segment', i) for i in range(len(self.segments))]
+            hits = [t for t in (self._ray_item(x, y, dx, dy, item) for item in items) if t is not None]
+            return min(hits + [max_distance])
+
+        step_column = 1 if dx > 0 else -1
+        step_row = 1 if dy > 0 else -1
+        next_x = (column + (dx > 0)) * self.cell_size
+        next_y = (row + (dy > 0)) * self.cell_size
+        t_next_x = (next_x - x) / dx if dx else math.inf
+        t_next_y = (next_y - y) / dy if dy else math.inf
+        t_delta_x = self.cell_size / abs(dx) if dx else math.inf
+        t_delta_y = self.cell_size / abs(dy) if dy else math.inf
+
+        best = max_distance
+        tested = set()
+        t_entry = 0.0
+        while t_entry <= best:
+            for item in self.cells.get((column, row), ()):
+                if item in tested:
+                    continue
+                tested.add(item)
+                t = self._ray_item(x, y, dx, dy, item)
+                if t is not None and t < best:
+                    best = t
+
+            if t_next_x < t_next_y:
+                t_entry = t_next_x
+                t_next_x += t_delta_x
+                column += step_column
+            else:
+                t_entry = t_next_y
+                t_next_y += t_delta_y
+                row += step_row
+
+            if not (0 <= column < self.columns and 0 <= row < self.rows):
+                break
+
+        return best
+
+    def collides(self, rect):
+        # Verdadeiro se o retangulo toca algum obstaculo das celulas que ele cobre
+        c0, r0, c1, r1 = self._cell_range(rect.left, rect.top, rect.right, rect.bottom)
+        for column in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                for kind, index in self.cells.get((column, row), ()):
+                    if kind == 'rect':
+                        if rect.colliderect(self.rects[index]):
+                            return True
+                    elif rect.clipline(self.segments[index]):
+                        return True
+        return False
+
+    def draw(self, surface, color=(60, 60, 60)):
+        for rect in self.rects:
+            pygame.draw.rect(surface, color, rect)
+        for x1, y1, x2, y2 in self.segments:
+            pygame.draw.line(surface, color, (x1, y1), (x2, y2), 3)
+
+class Track:
+    def __init__(self, width, height, start=None, obstacles=(), segments=(), targets=(), cell_size=50):
+        self.width = width
+        self.height = height
+        # Posicao e angulo iniciais do carro; por padrao o centro, como sem pista
+        self.start = tuple(start) if start else (width // 2, height // 2, 0)
+        self.targets = [tuple(target) for target in targets]
+
+        self.grid = ObstacleGrid(width, height, cell_size)
+        for rect in obstacles:
+            self.grid.add_rect(*rect)
+        for segment in segments:
+            self.grid.add_segment(*segment)
+
+def load_track(path):
+    # Formato: {"width", "height", "start": [x, y, angulo], "obstacles": [[x, y, w, h]], "segments": [[x1, y1, x2, y2]],
+    # "targets": [[x, y]], "cell_size"}; so width e height sao obrigatorios
+    with open(path) as file:
+        data = json.load(file)
+
+    return Track(
+        data['width'],
+        data['height'],
+        data.get('start'),
+        data.get('obstacles', ()),
+        data.get('segments', ()),
+        data.get('targets', ()),
+        data.get('cell_size', 50)
+    )
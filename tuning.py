@@ -0,0 +1,178 @@
+import argparse
+import copy
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fuzzy import FuzzyController
+
+# Ajuste dos pontos das funcoes de pertinencia: cada candidato roda varios episodios headless
+# em um processo do pool e recebe uma nota a partir das metricas da simulacao
+
+TUNED_VARIABLES = ('curva', 'distancia_borda')
+
+def drive(game, controller):
+    # Mesmo laco do main.py
+    observation = game.observe()
+    return game.step(controller.computar(observation.angle_to_target, observation.distance_to_wall))
+
+def run_episode(controller, seed, ticks, dt=1 / 60):
+    from game import GameLoop
+
+    game = GameLoop(headless=True, dt=dt, seed=seed)
+
+    wall_contacts = 0
+    touching = False
+    speed_sum = 0
+    for _ in range(ticks):
+        drive(game, controller)
+
+        speed_sum += game.player.speed
+        if game.player.touching_wall() and not touching:
+            wall_contacts += 1
+        touching = game.player.touching_wall()
+
+    minutes = ticks * dt / 60
+    return {
+        'targets_per_minute': game.target.reached / minutes,
+        'wall_contacts_per_minute': wall_contacts / minutes,
+        'mean_speed': speed_sum / ticks
+    }
+
+def evaluate(params, seeds, ticks, weights):
+    # Roda em um processo do pool: compila o controlador do candidato uma vez e reaproveita em todos os episodios
+    controller = FuzzyController(funcoes_pertinencia=params)
+    controller.compilar(validar=False)
+
+    episodes = [run_episode(controller, seed, ticks) for seed in seeds]
+    metrics = {name: float(np.mean([episode[name] for episode in episodes])) for name in episodes[0]}
+    metrics['score'] = sum(weights[name] * metrics[name] for name in weights)
+    return metrics
+
+def mutation_space(controller, variables=TUNED_VARIABLES):
+    # Decidido uma vez, a partir dos pontos originais: a escala da mutacao de cada variavel (a faixa em que as
+    # pertinencias mudam, e nao o universo inteiro), quais pontos de cada termo podem mudar (pontos nos limites do
+    # universo ou infinitos, os ombros, ficam fixos) e os limites de cada termo. Em universos que cruzam o zero
+    # (curva) cada termo fica do seu lado, para os termos de esquerda e direita nao trocarem de lugar
+    space = {}
+    for variable in variables:
+        universe = controller.universos[variable]
+        low, high = universe[0], universe[-1]
+        start, end = controller.faixa_ativa(variable)
+
+        terms = {}
+        for term, points in controller.funcoes_pertinencia[variable].items():
+            points = np.array(points, dtype=np.float64)
+            term_low, term_high = low, high
+            if low < 0 < high:
+                center = np.mean(points[np.isfinite(points)])
+                if center < 0:
+                    term_high = 0
+                elif center > 0:
+                    term_low = 0
+
+            terms[term] = {
+                'free': np.isfinite(points) & (points > low) & (points < high),
+                'low': term_low,
+                'high': term_high
+            }
+
+        space[variable] = {'scale': end - start, 'terms': terms}
+
+    return space
+
+def mutate(params, rng, sigma, space):
+    # Perturba os pontos livres de cada termo, com desvio sigma vezes a escala da variavel (ver mutation_space)
+    mutated = copy.deepcopy(params)
+    for variable, terms in mutated.items():
+        scale = space[variable]['scale']
+
+        for term, points in terms.items():
+            limits = space[variable]['terms'][term]
+            free = limits['free']
+
+            points = np.array(points, dtype=np.float64)
+            points[free] = np.clip(points[free] + rng.normal(0, sigma * scale, np.count_nonzero(free)), limits['low'], limits['high'])
+            terms[term] = [float(p) for p in np.sort(points)]
+
+    return mutated
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {'generation': 0, 'history': []}
+
+    with open(path) as file:
+        return json.load(file)
+
+def save_checkpoint(path, state):
+    # Escreve em um arquivo temporario e troca, para nao corromper o checkpoint se o processo for interrompido
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(path + '.tmp', path)
+
+def tune(method='evolution', generations=10, population=16, parents=4, episodes=4, ticks=3600, sigma=0.05,
+         seed=0, checkpoint='output/tuning/checkpoint.json', workers=None, weights=None):
+    weights = weights or {'targets_per_minute': 1.0, 'wall_contacts_per_minute': -0.5, 'mean_speed': 0.1}
+
+    base = FuzzyController()
+    space = mutation_space(base)
+    baseline = {variable: base.funcoes_pertinencia[variable] for variable in TUNED_VARIABLES}
+
+    state = load_checkpoint(checkpoint)
+    if state['generation']:
+        print(f"[INFO] Retomando do checkpoint na geracao {state['generation']}")
+
+    episode_seeds = [seed * 1000 + i for i in range(episodes)]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while state['generation'] < generations:
+            generation = state['generation']
+            rng = np.random.default_rng([seed, generation])
+
+            ranked = sorted(state['history'], key=lambda entry: entry['metrics']['score'], reverse=True)
+            if method == 'evolution' and ranked:
+                pool_parents = [entry['params'] for entry in ranked[:parents]]
+            else:
+                pool_parents = [baseline]
+
+            candidates = [baseline] if generation == 0 else []
+            while len(candidates) < population:
+                parent = pool_parents[rng.integers(len(pool_parents))]
+                candidates.append(mutate(parent, rng, sigma, space))
+
+            start = time.perf_counter()
+            futures = [pool.submit(evaluate, params, episode_seeds, ticks, weights) for params in candidates]
+            for params, future in zip(candidates, futures):
+                state['history'].append({'generation': generation, 'params': params, 'metrics': future.result()})
+
+            state['generation'] += 1
+            save_checkpoint(checkpoint, state)
+
+            best = max(state['history'], key=lambda entry: entry['metrics']['score'])
+            print(f"[INFO] Geracao {generation}: {len(candidates)} candidatos em {time.perf_counter() - start:.1f}s, "
+                  f"melhor nota {best['metrics']['score']:.3f} ({best['metrics']})")
+
+    return max(state['history'], key=lambda entry: entry['metrics']['score'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ajuste das funcoes de pertinencia em episodios headless')
+    parser.add_argument('--method', choices=['random', 'evolution'], default='evolution')
+    parser.add_argument('--generations', type=int, default=10)
+    parser.add_argument('--population', type=int, default=16)
+    parser.add_argument('--parents', type=int, default=4)
+    parser.add_argument('--episodes', type=int, default=4)
+    parser.add_argument('--ticks', type=int, default=3600)
+    parser.add_argument('--sigma', type=float, default=0.05, help='desvio da mutacao, como fracao da faixa em que as pertinencias mudam')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default='output/tuning/checkpoint.json')
+    args = parser.parse_args()
+
+    best = tune(args.method, args.generations, args.population, args.parents, args.episodes, args.ticks,
+                args.sigma, args.seed, args.checkpoint, args.workers)
+
+    print(json.dumps(best, indent=2))